@@ -1,42 +1,142 @@
+import time
+_PROCESS_START = time.perf_counter()
+
 import os
 from kivy.config import Config
 import json
 import threading
-import requests
+import queue
+import heapq
+import bisect
+import importlib
+import base64
+import gzip
+import sqlite3
+from collections import OrderedDict
 import re
-import time
+import socket
 import sys
-import serial
 import subprocess
 import platform
-import paho.mqtt.client as mqtt
-from time import sleep
-import RPi.GPIO as GPIO
-from datetime import datetime
+from datetime import datetime, timedelta
 from functools import partial
-from kivy.uix.vkeyboard import VKeyboard
 from kivy.app import App
 from kivy.lang import Builder
 from kivy.clock import Clock, mainthread
-from kivy.animation import Animation
 from kivy.factory import Factory
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
-from kivy.uix.textinput import TextInput
 from kivy.uix.popup import Popup
 from kivy.uix.screenmanager import ScreenManager, Screen, FadeTransition
 from kivy.uix.widget import Widget
 from kivy.core.window import Window
 from kivy.properties import StringProperty, BooleanProperty, NumericProperty
-from kivy.network.urlrequest import UrlRequest 
 from kivy.graphics import Color, RoundedRectangle
 
+
+class LazyModule:
+    """Imports ``name`` on first attribute access instead of at startup."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+requests = LazyModule("requests")
+serial = LazyModule("serial")
+mqtt = LazyModule("paho.mqtt.client")
+GPIO = LazyModule("RPi.GPIO")
+
+
+class StartupTimeline:
+    def __init__(self, started_at):
+        self.started_at = started_at
+        self.marks = []
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def mark(self, label):
+        with self._lock:
+            self.marks.append((label, time.perf_counter()))
+
+    def expect(self, *labels):
+        with self._lock:
+            self._pending.update(labels)
+
+    def done(self, label):
+        self.mark(label)
+        with self._lock:
+            self._pending.discard(label)
+            finished = not self._pending
+        if finished:
+            self.report()
+
+    def report(self):
+        lines = ["Startup timeline:"]
+        previous = self.started_at
+        with self._lock:
+            for label, at in self.marks:
+                lines.append(f"  {label:<22} +{(at - previous) * 1000:7.1f}ms  at {(at - self.started_at) * 1000:7.1f}ms")
+                previous = at
+        print("\n".join(lines))
+
+
+STARTUP = StartupTimeline(_PROCESS_START)
+
 ALARM_FILE = "alarms.json"
+ALARM_TIME_FORMAT = "%I:%M %p"
+ALARM_MAX_SLEEP = 30
+ALARM_MISSED_GRACE = 30 * 60
 LOG_FILE = "patient_logs.txt"   
+VITALS_FILE = "vitals_log.jsonl"
+HISTORY_DB_FILE = "vitals_history.db"
+# "jsonl" or "sqlite". The SQLite store imports vitals_log.jsonl once on
+# first open, so a unit can be switched over without losing history.
+HISTORY_BACKEND = "jsonl"
+HISTORY_PAGE_SIZE = 50
+CHAT_PAGE_SIZE = 20
 CHAT_FILE = "chat_history.json" 
+CHAT_LOG_FILE = "chat_history.jsonl"
 INVENTORY_FILE = "inventory.json" 
 TARGET_PHONE_NUMBER = "+639171234567" 
+SERIAL_PORT = "/dev/ttyACM0"
+SERIAL_BAUDRATE = 9600
+# Wi-Fi connects can hold a worker for 30 s, so they and scans get their own
+# classes and never starve status polls. "stream" pumps responder tokens; one
+# more than "llm" so a fallback can start while a timed-out pump unwinds.
+JOB_POOL_LIMITS = {"network": 1, "wifi_scan": 1, "wifi_connect": 1, "serial": 2, "llm": 2, "stream": 3, "system": 1}
+PERSIST_DEBOUNCE = 0.5
+IO_FLUSH_TIMEOUT = 5
+NMCLI_COMMAND = ["sudo", "/usr/bin/nmcli"]
+NETWORK_POLL_INTERVAL = 5
+WIRELESS_PROC_FILE = "/proc/net/wireless"
+WIFI_BACKEND = "dbus"
+WIFI_INTERFACE = "wlan0"
+WIFI_SCAN_INTERVAL = 20
+WIFI_IDLE_SCAN_INTERVAL = 120
+MQTT_HOST = "localhost"
+MQTT_PORT = 1883
+MQTT_KEEPALIVE = 60
+MQTT_TOPIC = "vitals/data"
+MQTT_QUEUE_FILE = "mqtt_queue.json"
+MQTT_QUEUE_MAX = 500
+MQTT_RECONNECT_MIN = 1
+MQTT_RECONNECT_MAX = 60
+DEVICE_ID = None
+TELEMETRY_TOPIC = "telemetry"
+TELEMETRY_SCHEMA_VERSION = 1
+TELEMETRY_ENCODING = "gzip"
+TELEMETRY_BATCH_SIZE = 10
+TELEMETRY_FLUSH_INTERVAL = 30
+TELEMETRY_HEALTH_INTERVAL = 300
+TELEMETRY_STATE_FILE = "telemetry_state.json"
+TELEMETRY_LEGACY_PUBLISH = True
 
 Config.set('graphics', 'fullscreen', 'auto')
 Config.set('graphics', 'window_state', 'maximized')
@@ -50,9 +150,58 @@ def send_vitals_to_dashboard(sys, dia, hr, classification):
         "classification": classification 
     }
     
+    app = App.get_running_app()
+    if app.telemetry:
+        app.telemetry.add_sample("vitals", data)
+
     payload = json.dumps(data)
-    mqtt_client.publish("vitals/data", payload)
-    print(f"Published to Node-RED: {payload}")
+    if not TELEMETRY_LEGACY_PUBLISH:
+        return
+    if app.mqtt_publisher is None:
+        print(f"MQTT publisher not started, dropped: {payload}")
+        return
+    app.mqtt_publisher.publish(MQTT_TOPIC, payload)
+    print(f"Queued for Node-RED: {payload}")
+
+
+def detect_device_id():
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                if line.startswith("Serial"):
+                    return "pi-" + line.split(":", 1)[1].strip().lstrip("0")
+    except Exception:
+        pass
+    try:
+        with open("/etc/machine-id", "r") as f:
+            return f.read().strip()[:16]
+    except Exception:
+        pass
+    return socket.gethostname()
+
+
+def encode_telemetry(envelope, encoding=TELEMETRY_ENCODING):
+    if encoding == "msgpack":
+        return importlib.import_module("msgpack").packb(envelope, use_bin_type=True)
+    if encoding == "cbor":
+        return importlib.import_module("cbor2").dumps(envelope)
+    text = json.dumps(envelope, separators=(",", ":"))
+    if encoding == "gzip":
+        return gzip.compress(text.encode("utf-8"))
+    return text
+
+
+def resolve_telemetry_encoding(preferred=TELEMETRY_ENCODING):
+    # msgpack and cbor2 are optional; fall back to gzip'd JSON without them.
+    module = {"msgpack": "msgpack", "cbor": "cbor2"}.get(preferred)
+    if module is None:
+        return preferred
+    try:
+        importlib.import_module(module)
+        return preferred
+    except ImportError:
+        print(f"{module} not installed, sending telemetry as gzip")
+        return "gzip"
 
 
 def resource_path(relative_path):
@@ -63,6 +212,31 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
+def classify_bp(sys, dia):
+    if sys < 120 and dia < 80:
+        return "Optimal"
+    elif 120 <= sys <= 129 or 80 <= dia <= 84:
+        return "Normal"
+    elif 130 <= sys <= 139 or 85 <= dia <= 89:
+        return "High Normal"
+    elif 140 <= sys <= 159 or 90 <= dia <= 99:
+        return "Grade 1 Hypertension"
+    elif 160 <= sys <= 179 or 100 <= dia <= 109:
+        return "Grade 2 Hypertension"
+    elif sys > 180 or dia > 110:
+        return "Grade 3 Hypertension"
+    elif sys > 140 and dia < 90:
+        return "Isolated Systolic Hypertension"
+    elif sys < 0:
+        return "Error. Try Again"
+    return None
+
+
+def format_reading(record):
+    timestamp = datetime.fromtimestamp(record["timestamp"]).strftime("%Y-%m-%d  %I:%M %p")
+    return f"[{timestamp}]       Blood Pressure: {record['systolic']}/{record['diastolic']}mmHg       Heart Rate:  {record['bpm']}bpm"
+
+
 def clean_response(text):
     text = re.sub(r'\n{3,}', '\n\n', text)
     text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
@@ -72,25 +246,2378 @@ def clean_response(text):
     return text.strip()
 
 
+def signal_bars(signal_level):
+    if signal_level > 80: return 4
+    if signal_level > 60: return 3
+    if signal_level > 30: return 2
+    return 1 if signal_level > 0 else 0
+
+
 class WifiSignalIcon(Widget):
     strength = NumericProperty(0)
 
 
-Builder.load_file(resource_path("new design.kv"))
+OLLAMA_HOST = "http://localhost:11434"
+MODEL = "deepseek-v3.1:671b-cloud"
+OLLAMA_CONNECT_TIMEOUT = 5
+OLLAMA_READ_TIMEOUT = 60
+OLLAMA_RETRIES = 2
+OLLAMA_RETRY_BACKOFF = 0.5
+OLLAMA_API = "chat"
+SYSTEM_PROMPT = "You are a helpful AI Assistant. Your name is Kairos. Answer concisely and professionally."
+PROMPT_TOKEN_BUDGET = 2048
+PROMPT_MAX_READINGS = 3
+LOCAL_MODEL = "llama3.2:1b"
+# Seconds to wait for a responder's first token before falling back. The
+# cloud model queues and loads remotely, so it gets a longer window.
+REMOTE_RESPONDER_DEADLINE = 20
+LOCAL_RESPONDER_DEADLINE = 8
+AI_CACHE_FILE = "ai_cache.json"
+AI_CACHE_TTL = 30 * 24 * 3600
+AI_CACHE_MAX_ENTRIES = 200
+STREAM_FLUSH_INTERVAL = 0
+
+
+
+class JobPool:
+    def __init__(self, limits=JOB_POOL_LIMITS):
+        self.limits = dict(limits)
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._pending = set()
+        self._stats = {}
+        for job_class, workers in limits.items():
+            self._queues[job_class] = queue.Queue()
+            self._stats[job_class] = {
+                "running": 0, "completed": 0, "failed": 0, "coalesced": 0,
+                "total_time": 0.0, "max_time": 0.0, "last_time": 0.0, "total_wait": 0.0,
+            }
+            for _ in range(workers):
+                threading.Thread(target=self._worker, args=(job_class,), daemon=True).start()
+
+    def submit(self, job_class, fn, *args, key=None, **kwargs):
+        with self._lock:
+            if key is not None:
+                if (job_class, key) in self._pending:
+                    self._stats[job_class]["coalesced"] += 1
+                    return False
+                self._pending.add((job_class, key))
+        self._queues[job_class].put((key, time.monotonic(), fn, args, kwargs))
+        return True
+
+    def is_pending(self, job_class, key):
+        with self._lock:
+            return (job_class, key) in self._pending
+
+    def _worker(self, job_class):
+        jobs = self._queues[job_class]
+        stats = self._stats[job_class]
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            key, queued_at, fn, args, kwargs = job
+            start = time.monotonic()
+            with self._lock:
+                stats["running"] += 1
+                stats["total_wait"] += start - queued_at
+            failed = False
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                failed = True
+                print(f"Job Error ({job_class}): {e}")
+            finally:
+                elapsed = time.monotonic() - start
+                with self._lock:
+                    stats["running"] -= 1
+                    stats["completed"] += 1
+                    stats["failed"] += failed
+                    stats["total_time"] += elapsed
+                    stats["last_time"] = elapsed
+                    stats["max_time"] = max(stats["max_time"], elapsed)
+                    if key is not None:
+                        self._pending.discard((job_class, key))
+
+    def stats(self):
+        report = {}
+        with self._lock:
+            for job_class, stats in self._stats.items():
+                completed = stats["completed"]
+                report[job_class] = {
+                    "queued": self._queues[job_class].qsize(),
+                    "running": stats["running"],
+                    "completed": completed,
+                    "failed": stats["failed"],
+                    "coalesced": stats["coalesced"],
+                    "avg_time": stats["total_time"] / completed if completed else 0.0,
+                    "max_time": stats["max_time"],
+                    "last_time": stats["last_time"],
+                    "avg_wait": stats["total_wait"] / (completed + stats["running"]) if completed + stats["running"] else 0.0,
+                }
+        return report
+
+    def shutdown(self):
+        for job_class, jobs in self._queues.items():
+            for _ in range(self.limits[job_class]):
+                jobs.put(None)
+
+
+class IOWorker:
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = set()
+        self._outstanding = 0
+        self._stats = {}
+        self.max_depth = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, target, fn, *args, key=None):
+        # One thread runs every job in submission order, so writes to the
+        # same file can never overtake each other.
+        with self._lock:
+            if key is not None:
+                if key in self._pending:
+                    self._target_stats(target)["coalesced"] += 1
+                    return False
+                self._pending.add(key)
+            self._outstanding += 1
+            self.max_depth = max(self.max_depth, self._outstanding)
+        self._queue.put((target, key, time.monotonic(), fn, args))
+        return True
 
+    def _target_stats(self, target):
+        stats = self._stats.get(target)
+        if stats is None:
+            stats = self._stats[target] = {
+                "completed": 0, "failed": 0, "coalesced": 0,
+                "total_wait": 0.0, "max_wait": 0.0, "total_time": 0.0, "max_time": 0.0,
+            }
+        return stats
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            target, key, queued_at, fn, args = job
+            start = time.monotonic()
+            if key is not None:
+                # Drop the key before running so a save made meanwhile queues again.
+                with self._lock:
+                    self._pending.discard(key)
+            failed = False
+            try:
+                fn(*args)
+            except Exception as e:
+                failed = True
+                print(f"IO Error ({target}): {e}")
+            finally:
+                elapsed = time.monotonic() - start
+                with self._lock:
+                    stats = self._target_stats(target)
+                    stats["completed"] += 1
+                    stats["failed"] += failed
+                    stats["total_wait"] += start - queued_at
+                    stats["max_wait"] = max(stats["max_wait"], start - queued_at)
+                    stats["total_time"] += elapsed
+                    stats["max_time"] = max(stats["max_time"], elapsed)
+                    self._outstanding -= 1
+                    if not self._outstanding:
+                        self._idle.notify_all()
+
+    def flush(self, timeout=IO_FLUSH_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._outstanding:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
-MODEL = "deepseek-v3.1:671b-cloud"
+    def stats(self):
+        report = {}
+        with self._lock:
+            for target, stats in self._stats.items():
+                completed = stats["completed"]
+                report[target] = {
+                    "completed": completed,
+                    "failed": stats["failed"],
+                    "coalesced": stats["coalesced"],
+                    "avg_wait": stats["total_wait"] / completed if completed else 0.0,
+                    "max_wait": stats["max_wait"],
+                    "avg_time": stats["total_time"] / completed if completed else 0.0,
+                    "max_time": stats["max_time"],
+                }
+        return report
+
+    def stop(self):
+        self._queue.put(None)
+
+
+def atomic_write_text(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    try:
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    atomic_write_text(path, json.dumps(data, **dump_kwargs))
+
+
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        # Keep the unreadable file for inspection instead of silently
+        # overwriting it with the default on the next save.
+        print(f"Error loading {path}: {e}")
+        try:
+            os.replace(path, path + ".corrupt")
+        except OSError:
+            pass
+        return default
+
+
+class JsonDocument:
+    def __init__(self, path, default, io_worker=None, delay=PERSIST_DEBOUNCE, **dump_kwargs):
+        self.path = path
+        self.default = default
+        self.io_worker = io_worker
+        self.delay = delay
+        self.dump_kwargs = dump_kwargs
+        self.writes = 0
+        self._pending = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._trigger = Clock.create_trigger(self._submit, delay) if io_worker else None
+
+    def load(self):
+        return load_json(self.path, self.default)
+
+    def save(self, data):
+        # Serialise now so later edits to ``data`` can't leak into the write.
+        text = json.dumps(data, **self.dump_kwargs)
+        with self._lock:
+            self._pending = text
+        if self._trigger:
+            self._trigger()
+        else:
+            self.flush()
+
+    def _submit(self, dt):
+        self.io_worker.submit(self.path, self.flush, key=self.path)
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                text, self._pending = self._pending, None
+            if text is None:
+                return
+            try:
+                atomic_write_text(self.path, text)
+                self.writes += 1
+            except Exception as e:
+                print(f"Error saving {self.path}: {e}")
+
+
+class MqttPublisher:
+    def __init__(self, io_worker, host=MQTT_HOST, port=MQTT_PORT, queue_path=MQTT_QUEUE_FILE,
+                 max_queued=MQTT_QUEUE_MAX, keepalive=MQTT_KEEPALIVE):
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.max_queued = max_queued
+        self.connected = False
+        self.dropped = 0
+        self.sent = 0
+        self._store = JsonDocument(queue_path, [], io_worker)
+        self._queue = OrderedDict()
+        self._handed = set()
+        self._inflight = {}
+        self._early_acks = set()
+        self._next_seq = 1
+        self._lock = threading.RLock()
+        self._hand_off_lock = threading.Lock()
+        self._client = None
+
+    def start(self):
+        for entry in self._store.load():
+            self._queue[entry["seq"]] = entry
+        if self._queue:
+            self._next_seq = max(self._queue) + 1
+            print(f"MQTT: {len(self._queue)} queued messages waiting for the broker")
+
+        client = mqtt.Client()
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_publish = self._on_publish
+        client.max_queued_messages_set(self.max_queued)
+        client.reconnect_delay_set(min_delay=MQTT_RECONNECT_MIN, max_delay=MQTT_RECONNECT_MAX)
+        # connect_async returns at once; the network loop thread connects
+        # and keeps reconnecting with backoff while the broker is away.
+        client.connect_async(self.host, self.port, self.keepalive)
+        client.loop_start()
+        self._client = client
+        self._hand_off()
+
+    def stop(self):
+        if self._client:
+            self._client.loop_stop()
+            self._client.disconnect()
+            self._client = None
+        self._store.flush()
+
+    def publish(self, topic, payload):
+        with self._lock:
+            entry = {"seq": self._next_seq, "topic": topic, "payload": payload}
+            if isinstance(payload, bytes):
+                entry["payload"] = base64.b64encode(payload).decode("ascii")
+                entry["binary"] = True
+            self._next_seq += 1
+            self._queue[entry["seq"]] = entry
+            while len(self._queue) > self.max_queued:
+                self._queue.popitem(last=False)
+                self.dropped += 1
+            self._save()
+        self._hand_off()
+
+    def pending(self):
+        with self._lock:
+            return len(self._queue)
+
+    def _save(self):
+        self._store.save(list(self._queue.values()))
+
+    def _next_unhanded(self):
+        for entry in self._queue.values():
+            if entry["seq"] not in self._handed:
+                return entry
+        return None
+
+    def _hand_off(self, dt=None):
+        # Each entry goes to paho once; paho keeps unacknowledged QoS 1
+        # messages and resends them itself after a reconnect.
+        #
+        # client.publish takes paho's message mutex, and paho holds that
+        # mutex while calling _on_publish, which takes self._lock. So
+        # publish is never called with self._lock held.
+        client = self._client
+        if client is None:
+            return
+        with self._hand_off_lock:
+            while True:
+                with self._lock:
+                    entry = self._next_unhanded()
+                    if entry is None:
+                        return
+                    self._handed.add(entry["seq"])
+                payload = base64.b64decode(entry["payload"]) if entry.get("binary") else entry["payload"]
+                info = client.publish(entry["topic"], payload, qos=1)
+                with self._lock:
+                    if info.rc == mqtt.MQTT_ERR_QUEUE_SIZE:
+                        # paho's buffer is full; retried after the next ack.
+                        self._handed.discard(entry["seq"])
+                        return
+                    if info.mid in self._early_acks:
+                        self._early_acks.discard(info.mid)
+                        self._ack(entry["seq"])
+                    else:
+                        self._inflight[info.mid] = entry["seq"]
+
+    def _schedule_hand_off(self):
+        # Called from paho's thread, so the hand-off runs on the Kivy thread.
+        with self._lock:
+            if self._next_unhanded() is None:
+                return
+        Clock.schedule_once(self._hand_off, 0)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            print(f"MQTT Connection Error: rc={rc}")
+            return
+        with self._lock:
+            self.connected = True
+        self._schedule_hand_off()
+
+    def _on_disconnect(self, client, userdata, rc):
+        with self._lock:
+            self.connected = False
+        if rc != 0:
+            print(f"MQTT disconnected (rc={rc}), {self.pending()} messages queued")
+
+    def _on_publish(self, client, userdata, mid):
+        with self._lock:
+            seq = self._inflight.pop(mid, None)
+            if seq is None:
+                # The PUBACK beat _hand_off to recording the mid.
+                self._early_acks.add(mid)
+                return
+            self._ack(seq)
+        self._schedule_hand_off()
+
+    def _ack(self, seq):
+        self._handed.discard(seq)
+        if self._queue.pop(seq, None) is None:
+            return
+        self.sent += 1
+        self._save()
+
+
+class TelemetryBatcher:
+    def __init__(self, publisher, io_worker, device_id=None, encoding=TELEMETRY_ENCODING,
+                 batch_size=TELEMETRY_BATCH_SIZE, flush_interval=TELEMETRY_FLUSH_INTERVAL,
+                 health_interval=TELEMETRY_HEALTH_INTERVAL, state_path=TELEMETRY_STATE_FILE):
+        self.publisher = publisher
+        self.device_id = device_id or detect_device_id()
+        self.encoding = resolve_telemetry_encoding(encoding)
+        self.topic = f"{TELEMETRY_TOPIC}/{self.device_id}/{self.encoding}"
+        self.batch_size = batch_size
+        self.health_interval = health_interval
+        self.batches = 0
+        self.bytes_sent = 0
+        self._state = JsonDocument(state_path, {"seq": 0}, io_worker)
+        self._seq = 0
+        self._samples = []
+        self._flush_trigger = Clock.create_trigger(lambda dt: self.flush(), flush_interval)
+        self._health_event = None
+
+    def start(self):
+        state = self._state.load()
+        self._seq = state.get("seq", 0) if isinstance(state, dict) else 0
+        if self.health_interval:
+            self._health_event = Clock.schedule_interval(lambda dt: self.add_health_sample(), self.health_interval)
+
+    def stop(self):
+        if self._health_event:
+            self._health_event.cancel()
+            self._health_event = None
+        self.flush()
+        self._state.flush()
+
+    def add_sample(self, kind, data):
+        self._samples.append({"type": kind, "ts": round(time.time(), 3), "data": data})
+        if len(self._samples) >= self.batch_size:
+            self.flush()
+        else:
+            self._flush_trigger()
+
+    def add_health_sample(self):
+        self.add_sample("health", self._read_health())
+
+    def _read_health(self):
+        health = {"mqtt_queued": self.publisher.pending()}
+        try:
+            with open("/sys/class/thermal/thermal_zone0/temp", "r") as f:
+                health["cpu_temp"] = int(f.read().strip()) / 1000.0
+        except Exception:
+            pass
+        try:
+            health["load"] = round(os.getloadavg()[0], 2)
+        except (AttributeError, OSError):
+            pass
+        try:
+            with open("/proc/uptime", "r") as f:
+                health["uptime"] = int(float(f.read().split()[0]))
+        except Exception:
+            pass
+        try:
+            st = os.statvfs(".")
+            health["disk_free_mb"] = st.f_bavail * st.f_frsize // (1024 * 1024)
+        except (AttributeError, OSError):
+            pass
+        return health
+
+    def flush(self):
+        self._flush_trigger.cancel()
+        if not self._samples:
+            return
+        # The sequence number survives restarts so the dashboard can spot
+        # gaps and drop duplicates replayed from the offline queue.
+        self._seq += 1
+        envelope = {
+            "schema": TELEMETRY_SCHEMA_VERSION,
+            "device": self.device_id,
+            "seq": self._seq,
+            "sent": round(time.time(), 3),
+            "samples": self._samples,
+        }
+        self._samples = []
+        self._state.save({"seq": self._seq})
+        payload = encode_telemetry(envelope, self.encoding)
+        self.publisher.publish(self.topic, payload)
+        self.batches += 1
+        self.bytes_sent += len(payload)
+
+
+class NetworkStatusService:
+    def __init__(self, job_pool, wifi_backend, interval=NETWORK_POLL_INTERVAL, nmcli_cmd=NMCLI_COMMAND):
+        self.job_pool = job_pool
+        self.wifi_backend = wifi_backend
+        self.interval = interval
+        self.nmcli_cmd = list(nmcli_cmd)
+        self.is_connected = False
+        self.signal_level = 0
+        self.checked_at = 0.0
+        self.forks = 0
+        self._profiles = []
+        self._profiles_at = 0.0
+        self._subscribers = []
+        self._poll_event = None
+
+    def start(self):
+        if self._poll_event is None:
+            self._poll_event = Clock.schedule_interval(self._poll, self.interval)
+        self.refresh()
+
+    def stop(self):
+        if self._poll_event:
+            self._poll_event.cancel()
+            self._poll_event = None
+
+    def subscribe(self, callback):
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+        if self.checked_at:
+            callback(self.is_connected, self.signal_level)
+        self.refresh()
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def is_fresh(self):
+        return self.checked_at and time.monotonic() - self.checked_at < self.interval
+
+    def refresh(self, force=False):
+        if not force and self.is_fresh():
+            return
+        self.job_pool.submit("network", self._check, key="network_status")
+
+    def invalidate(self):
+        self.checked_at = 0.0
+        self._profiles_at = 0.0
+        self.refresh(force=True)
+
+    def _poll(self, dt):
+        # The timer sets the cadence; freshness only dedupes the refreshes
+        # triggered by subscribe(), so a due poll always runs.
+        if self._subscribers:
+            self.refresh(force=True)
+
+    def _run(self, args, timeout):
+        self.forks += 1
+        return subprocess.check_output(self.nmcli_cmd + args, timeout=timeout).decode('utf-8', errors='ignore')
+
+    def _read_signal_level(self):
+        try:
+            with open(WIRELESS_PROC_FILE, "r") as f:
+                for line in f.readlines()[2:]:
+                    parts = line.split()
+                    if len(parts) > 2 and parts[0].startswith("wl"):
+                        return max(0, min(100, int(float(parts[2]) * 100 / 70)))
+        except Exception:
+            pass
+        return 75
+
+    def _check(self):
+        started = time.monotonic()
+        is_connected = False
+        signal_level = 0
+        try:
+            if platform.system() == "Windows":
+                self.forks += 1
+                output = subprocess.check_output("netsh wlan show interfaces", shell=True, timeout=3).decode(errors='ignore')
+                if "State" in output and "connected" in output:
+                    is_connected = True
+                    signal_level = 100
+                    for line in output.splitlines():
+                        if "Signal" in line:
+                            try:
+                                signal_level = int(line.split(":")[-1].strip().replace('%', ''))
+                            except ValueError:
+                                pass
+                            break
+            else:
+                output = self._run(["-t", "-f", "DEVICE,TYPE,STATE", "dev"], timeout=3)
+                for line in output.splitlines():
+                    parts = line.split(":")
+                    if len(parts) >= 3 and (parts[1] == "wifi" or "wlan" in parts[0]) and parts[2] == "connected":
+                        is_connected = True
+                        signal_level = self._read_signal_level()
+                        break
+        except Exception as e:
+            print(f"Wifi Check Error: {e}")
+
+        self.is_connected = is_connected
+        self.signal_level = signal_level
+        self.checked_at = started
+        Clock.schedule_once(self._notify, 0)
+
+    def _notify(self, dt):
+        for callback in list(self._subscribers):
+            try:
+                callback(self.is_connected, self.signal_level)
+            except Exception as e:
+                print(f"Network Subscriber Error: {e}")
+
+    def saved_profiles(self):
+        if self._profiles_at and time.monotonic() - self._profiles_at < self.interval:
+            return self._profiles
+        try:
+            self._profiles = self.wifi_backend.saved_profiles()
+            self._profiles_at = time.monotonic()
+        except Exception:
+            self._profiles = []
+        return self._profiles
+
+    def has_saved_profile(self, ssid):
+        return ssid in self.saved_profiles()
+
+
+class WifiScanService:
+    def __init__(self, job_pool, wifi_backend, interval=WIFI_SCAN_INTERVAL, idle_interval=WIFI_IDLE_SCAN_INTERVAL):
+        self.job_pool = job_pool
+        self.wifi_backend = wifi_backend
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.enabled = True
+        self.networks = []
+        self.scanned_at = 0.0
+        self.scanned_wall_time = 0.0
+        self.last_error = None
+        self._subscribers = []
+        self._poll_event = None
+
+    def start(self):
+        if self._poll_event is None:
+            self._poll_event = Clock.schedule_interval(self._poll, self.interval)
+        self.wifi_backend.add_listener(self._on_backend_event)
+        self.refresh()
+
+    def stop(self):
+        if self._poll_event:
+            self._poll_event.cancel()
+            self._poll_event = None
+        if self.wifi_backend:
+            self.wifi_backend.remove_listener(self._on_backend_event)
+
+    def subscribe(self, callback):
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+        if self.scanned_at:
+            callback(self.networks, self.scanned_wall_time)
+        self.refresh()
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def age(self):
+        return time.monotonic() - self.scanned_at if self.scanned_at else None
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if not enabled:
+            self.networks = []
+            self.scanned_at = 0.0
+
+    def refresh(self, force=False, rescan=True):
+        if not self.enabled:
+            return
+        age = self.age()
+        if not force and age is not None and age < self.interval:
+            return
+        self.job_pool.submit("wifi_scan", self._scan, rescan, key="wifi_scan")
+
+    def _poll(self, dt):
+        # With nobody looking, keep the cache warm at a slower cadence.
+        age = self.age()
+        if self._subscribers or age is None or age >= self.idle_interval:
+            self.refresh()
+
+    def _on_backend_event(self, event):
+        # The backend already holds fresh results; just re-read them.
+        self.refresh(force=True, rescan=False)
+
+    def _scan(self, rescan):
+        try:
+            networks = self.wifi_backend.scan(rescan)
+            self.last_error = None
+        except Exception as e:
+            print(f"Wifi Scan Error: {e}")
+            self.last_error = e
+            Clock.schedule_once(self._notify, 0)
+            return
+
+        networks.sort(key=lambda x: (not x['active'], -x.get('signal', 0), x['ssid']))
+        self.networks = networks
+        self.scanned_at = time.monotonic()
+        self.scanned_wall_time = time.time()
+        Clock.schedule_once(self._notify, 0)
+
+    def _notify(self, dt):
+        for callback in list(self._subscribers):
+            try:
+                callback(self.networks, self.scanned_wall_time)
+            except Exception as e:
+                print(f"Wifi Scan Subscriber Error: {e}")
+
+
+class WifiBackend:
+    name = "base"
+
+    def __init__(self):
+        self._listeners = []
+
+    def add_listener(self, callback):
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _emit(self, event):
+        for callback in list(self._listeners):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Wifi Listener Error: {e}")
+
+    def scan(self, rescan=True):
+        raise NotImplementedError
+
+    def set_radio(self, turn_on):
+        raise NotImplementedError
+
+    def connect(self, ssid, password):
+        raise NotImplementedError
+
+    def connect_saved(self, ssid):
+        raise NotImplementedError
+
+    def disconnect(self, ssid):
+        raise NotImplementedError
+
+    def saved_profiles(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class NetshWifiBackend(WifiBackend):
+    name = "netsh"
+
+    def scan(self, rescan=True):
+        networks_data = []
+        current = None
+        try:
+            cmd = subprocess.check_output("netsh wlan show networks mode=bssid", shell=True, timeout=5)
+            decoded = cmd.decode('utf-8', errors='ignore')
+            for line in decoded.split('\n'):
+                if ":" not in line:
+                    continue
+                key, value = [part.strip() for part in line.split(":", 1)]
+                if key.startswith("SSID"):
+                    current = {'ssid': value, 'active': False, 'signal': 0, 'security': "", 'bssid': ""}
+                    if value:
+                        networks_data.append(current)
+                elif current is None:
+                    continue
+                elif key == "Authentication":
+                    current['security'] = "" if value == "Open" else value
+                elif key.startswith("BSSID") and not current['bssid']:
+                    current['bssid'] = value
+                elif key == "Signal" and not current['signal']:
+                    try:
+                        current['signal'] = int(value.replace('%', ''))
+                    except ValueError:
+                        pass
+        except subprocess.TimeoutExpired:
+            pass
+        return networks_data
+
+    def set_radio(self, turn_on):
+        pass
+
+    def connect(self, ssid, password):
+        return False
+
+    def connect_saved(self, ssid):
+        return False
+
+    def disconnect(self, ssid):
+        return False
+
+    def saved_profiles(self):
+        return []
+
+
+class NmcliWifiBackend(WifiBackend):
+    name = "nmcli"
+
+    def __init__(self, nmcli_cmd=NMCLI_COMMAND, interface=WIFI_INTERFACE):
+        super().__init__()
+        self.nmcli_cmd = list(nmcli_cmd)
+        self.interface = interface
+
+    def scan(self, rescan=True):
+        if rescan:
+            try:
+                subprocess.run(self.nmcli_cmd + ["device", "wifi", "rescan"], timeout=5)
+            except Exception:
+                pass
+
+        by_ssid = {}
+        try:
+            cmd = subprocess.check_output(
+                self.nmcli_cmd + ["-t", "-f", "ACTIVE,SSID,SIGNAL,SECURITY,BSSID", "dev", "wifi", "list"], timeout=10
+            )
+            decoded = cmd.decode('utf-8', errors='ignore')
+            for line in decoded.split('\n'):
+                # Terse output escapes literal colons (as in the BSSID) with a backslash.
+                fields = [f.replace('\\:', ':') for f in re.split(r'(?<!\\):', line)]
+                if len(fields) < 5:
+                    continue
+                active_str, ssid, signal, security, bssid = fields[:5]
+                ssid = ssid.strip()
+                if not ssid or "--" in ssid:
+                    continue
+                entry = {
+                    'ssid': ssid,
+                    'active': active_str.lower() == 'yes',
+                    'signal': int(signal) if signal.isdigit() else 0,
+                    'security': "" if security in ("", "--") else security,
+                    'bssid': bssid,
+                }
+                current = by_ssid.get(ssid)
+                if current is None or (entry['active'], entry['signal']) > (current['active'], current['signal']):
+                    by_ssid[ssid] = entry
+        except subprocess.TimeoutExpired:
+            pass
+        return list(by_ssid.values())
+
+    def set_radio(self, turn_on):
+        state = "on" if turn_on else "off"
+        try:
+            subprocess.run(self.nmcli_cmd + ["radio", "wifi", state])
+        except Exception:
+            pass
+
+    def connect(self, ssid, password):
+        try:
+            subprocess.run(self.nmcli_cmd + ["connection", "delete", "id", ssid], capture_output=True, timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+        cmd_add = self.nmcli_cmd + [
+            "connection", "add",
+            "type", "wifi",
+            "con-name", ssid,
+            "ifname", self.interface,
+            "ssid", ssid,
+            "802-11-wireless-security.key-mgmt", "wpa-psk",
+            "802-11-wireless-security.psk", password
+        ]
+        result_add = subprocess.run(cmd_add, capture_output=True, text=True, timeout=15)
+        if result_add.returncode != 0:
+            return False
+
+        result_up = subprocess.run(self.nmcli_cmd + ["connection", "up", ssid], capture_output=True, text=True, timeout=15)
+        return result_up.returncode == 0
+
+    def connect_saved(self, ssid):
+        res = subprocess.run(self.nmcli_cmd + ["connection", "up", "id", ssid], capture_output=True, timeout=15)
+        return res.returncode == 0
+
+    def disconnect(self, ssid):
+        res = subprocess.run(self.nmcli_cmd + ["connection", "down", "id", ssid], capture_output=True, timeout=10)
+        return res.returncode == 0
+
+    def saved_profiles(self):
+        output = subprocess.check_output(self.nmcli_cmd + ["-g", "NAME", "connection", "show"], timeout=2).decode('utf-8')
+        return output.strip().split('\n')
+
+
+class DbusWifiBackend(WifiBackend):
+    name = "dbus"
+    NM = "org.freedesktop.NetworkManager"
+    NM_PATH = "/org/freedesktop/NetworkManager"
+    SETTINGS_PATH = "/org/freedesktop/NetworkManager/Settings"
+    DEVICE_TYPE_WIFI = 2
+    ACTIVE_STATE_ACTIVATED = 2
+    ACTIVE_STATE_DEACTIVATED = 4
+
+    def __init__(self, bus_address=None, interface=WIFI_INTERFACE):
+        super().__init__()
+        import dbus
+        from dbus.mainloop.glib import DBusGMainLoop
+        from gi.repository import GLib
+
+        DBusGMainLoop(set_as_default=True)
+        self.dbus = dbus
+        self.interface = interface
+        self.bus = dbus.bus.BusConnection(bus_address) if bus_address else dbus.SystemBus()
+        self.nm = dbus.Interface(self.bus.get_object(self.NM, self.NM_PATH), self.NM)
+        self.device_path = self._find_wifi_device()
+        if self.device_path is None:
+            raise RuntimeError("No Wi-Fi device managed by NetworkManager")
+        self.device_obj = self.bus.get_object(self.NM, self.device_path)
+        self.wireless = dbus.Interface(self.device_obj, self.NM + ".Device.Wireless")
+        self._state_changed = threading.Event()
+
+        self.bus.add_signal_receiver(
+            self._on_access_point_added, signal_name="AccessPointAdded",
+            dbus_interface=self.NM + ".Device.Wireless", path=self.device_path
+        )
+        self.bus.add_signal_receiver(
+            self._on_access_point_removed, signal_name="AccessPointRemoved",
+            dbus_interface=self.NM + ".Device.Wireless", path=self.device_path
+        )
+        self.bus.add_signal_receiver(
+            self._on_state_changed, signal_name="StateChanged",
+            dbus_interface=self.NM + ".Device", path=self.device_path
+        )
+        self._loop = GLib.MainLoop()
+        threading.Thread(target=self._loop.run, daemon=True).start()
+
+    def _props(self, path, interface):
+        obj = self.bus.get_object(self.NM, path)
+        return self.dbus.Interface(obj, "org.freedesktop.DBus.Properties").GetAll(interface)
+
+    def _find_wifi_device(self):
+        fallback = None
+        for path in self.nm.GetDevices():
+            props = self._props(path, self.NM + ".Device")
+            if int(props.get("DeviceType", 0)) != self.DEVICE_TYPE_WIFI:
+                continue
+            if str(props.get("Interface", "")) == self.interface:
+                return path
+            fallback = fallback or path
+        return fallback
+
+    def _on_access_point_added(self, path):
+        self._emit("scan")
+
+    def _on_access_point_removed(self, path):
+        self._emit("scan")
+
+    def _on_state_changed(self, new_state, old_state, reason):
+        self._state_changed.set()
+        self._emit("state")
+
+    @staticmethod
+    def _security(props):
+        rsn = int(props.get("RsnFlags", 0))
+        wpa = int(props.get("WpaFlags", 0))
+        if rsn & 0x400:
+            return "WPA3"
+        if rsn:
+            return "WPA2"
+        if wpa:
+            return "WPA1"
+        if int(props.get("Flags", 0)) & 0x1:
+            return "WEP"
+        return ""
+
+    def scan(self, rescan=True):
+        if rescan:
+            before = self._props(self.device_path, self.NM + ".Device.Wireless").get("LastScan", 0)
+            try:
+                self.wireless.RequestScan({})
+                deadline = time.monotonic() + 5
+                while time.monotonic() < deadline:
+                    if self._props(self.device_path, self.NM + ".Device.Wireless").get("LastScan", 0) != before:
+                        break
+                    time.sleep(0.25)
+            except self.dbus.DBusException:
+                pass
+
+        active_path = self._props(self.device_path, self.NM + ".Device.Wireless").get("ActiveAccessPoint", "/")
+        by_ssid = {}
+        for ap_path in self.wireless.GetAllAccessPoints():
+            props = self._props(ap_path, self.NM + ".AccessPoint")
+            ssid = bytes(bytearray(props.get("Ssid", []))).decode('utf-8', errors='ignore').strip()
+            if not ssid:
+                continue
+            entry = {
+                'ssid': ssid,
+                'active': ap_path == active_path,
+                'signal': int(props.get("Strength", 0)),
+                'security': self._security(props),
+                'bssid': str(props.get("HwAddress", "")),
+            }
+            current = by_ssid.get(ssid)
+            if current is None or (entry['active'], entry['signal']) > (current['active'], current['signal']):
+                by_ssid[ssid] = entry
+        return list(by_ssid.values())
+
+    def set_radio(self, turn_on):
+        props = self.dbus.Interface(self.bus.get_object(self.NM, self.NM_PATH), "org.freedesktop.DBus.Properties")
+        props.Set(self.NM, "WirelessEnabled", self.dbus.Boolean(turn_on))
+
+    def _connections(self):
+        settings = self.dbus.Interface(self.bus.get_object(self.NM, self.SETTINGS_PATH), self.NM + ".Settings")
+        for path in settings.ListConnections():
+            conn = self.dbus.Interface(self.bus.get_object(self.NM, path), self.NM + ".Settings.Connection")
+            yield path, conn, conn.GetSettings()
+
+    def _wait_for_activation(self, active_path, timeout=15):
+        # The device can still report ACTIVATED for the network it is
+        # leaving, so only the new active connection's own state counts.
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                state = int(self._props(active_path, self.NM + ".Connection.Active").get("State", 0))
+            except self.dbus.DBusException:
+                # NM removes the active connection object once it fails.
+                return False
+            if state == self.ACTIVE_STATE_ACTIVATED:
+                return True
+            if state == self.ACTIVE_STATE_DEACTIVATED:
+                return False
+            self._state_changed.wait(0.5)
+            self._state_changed.clear()
+        return False
+
+    def connect(self, ssid, password):
+        for path, conn, settings in self._connections():
+            if str(settings.get("connection", {}).get("id", "")) == ssid:
+                conn.Delete()
+
+        dbus = self.dbus
+        settings = {
+            "connection": {"id": ssid, "type": "802-11-wireless", "interface-name": self.interface},
+            "802-11-wireless": {"ssid": dbus.ByteArray(ssid.encode("utf-8")), "mode": "infrastructure"},
+            "802-11-wireless-security": {"key-mgmt": "wpa-psk", "psk": password},
+            "ipv4": {"method": "auto"},
+            "ipv6": {"method": "auto"},
+        }
+        self._state_changed.clear()
+        _, active_path = self.nm.AddAndActivateConnection(settings, self.device_path, "/")
+        return self._wait_for_activation(active_path)
+
+    def connect_saved(self, ssid):
+        for path, conn, settings in self._connections():
+            if str(settings.get("connection", {}).get("id", "")) == ssid:
+                self._state_changed.clear()
+                active_path = self.nm.ActivateConnection(path, self.device_path, "/")
+                return self._wait_for_activation(active_path)
+        return False
+
+    def disconnect(self, ssid):
+        # Device.Disconnect would also block autoconnect on the device, so
+        # only the active connection for this network is taken down.
+        for path in self._props(self.NM_PATH, self.NM).get("ActiveConnections", []):
+            if str(self._props(path, self.NM + ".Connection.Active").get("Id", "")) == ssid:
+                self.nm.DeactivateConnection(path)
+                return True
+        return False
+
+    def saved_profiles(self):
+        return [str(settings.get("connection", {}).get("id", "")) for path, conn, settings in self._connections()]
+
+    def close(self):
+        self._loop.quit()
+
+
+def create_wifi_backend(preferred=WIFI_BACKEND):
+    if platform.system() == "Windows":
+        return NetshWifiBackend()
+    if preferred == "dbus":
+        try:
+            return DbusWifiBackend()
+        except Exception as e:
+            print(f"D-Bus Wi-Fi backend unavailable, using nmcli: {e}")
+    return NmcliWifiBackend(NMCLI_COMMAND)
+
+
+class SerialManager:
+    def __init__(self, job_pool, port=SERIAL_PORT, baudrate=SERIAL_BAUDRATE, reconnect_delay=5.0):
+        self.job_pool = job_pool
+        self.port = port
+        self.baudrate = baudrate
+        self.reconnect_delay = reconnect_delay
+        self.ser = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._write_queue = queue.Queue()
+        self._stop_event = threading.Event()
+
+    @property
+    def is_open(self):
+        ser = self.ser
+        return ser is not None and ser.is_open
+
+    def start(self):
+        if self.job_pool.is_pending("serial", "reader"):
+            return
+        self._stop_event.clear()
+        self._open()
+        self.job_pool.submit("serial", self._read_loop, key="reader")
+        self.job_pool.submit("serial", self._write_loop, key="writer")
+
+    def stop(self):
+        self._stop_event.set()
+        self._write_queue.put(None)
+        self._close()
+
+    def subscribe(self, callback):
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._write_queue.put(data)
+
+    def _open(self):
+        try:
+            self.ser = serial.Serial(self.port, self.baudrate, timeout=1)
+            return True
+        except Exception as e:
+            print(f"Serial Open Error: {e}")
+            self.ser = None
+            return False
+
+    def _close(self):
+        ser = self.ser
+        self.ser = None
+        if ser is not None:
+            try: ser.close()
+            except Exception: pass
+
+    def _publish(self, frame):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(*frame)
+            except Exception as e:
+                print(f"Serial Subscriber Error: {e}")
+
+    def _read_loop(self):
+        while not self._stop_event.is_set():
+            ser = self.ser
+            if ser is None or not ser.is_open:
+                if not self._open():
+                    self._stop_event.wait(self.reconnect_delay)
+                continue
+
+            try:
+                raw = ser.readline()
+            except Exception:
+                self._close()
+                continue
+            if not raw:
+                continue
+
+            line = raw.decode('utf-8', errors='ignore').strip()
+            if not line or line == "Err":
+                continue
+            parts = line.split("=")
+            if len(parts) == 3:
+                self._publish(parts)
+
+    def _write_loop(self):
+        while True:
+            data = self._write_queue.get()
+            if data is None or self._stop_event.is_set():
+                break
+            ser = self.ser
+            if ser is None or not ser.is_open:
+                print(f"Serial Write Dropped (port closed): {data!r}")
+                continue
+            try:
+                ser.write(data)
+            except Exception as e:
+                print(f"Serial Write Error: {e}")
+
+
+LEGACY_LOG_PATTERN = re.compile(r"\[(.+?)\]\s+Blood Pressure:\s*(-?\d+)/(-?\d+)mmHg\s+Heart Rate:\s*(-?\d+)bpm")
+
+
+def parse_legacy_log_line(line):
+    match = LEGACY_LOG_PATTERN.search(line)
+    if not match:
+        return None
+    stamp, sys_val, dia_val, bpm_val = match.groups()
+    try:
+        timestamp = datetime.strptime(stamp.strip(), "%Y-%m-%d  %I:%M %p").timestamp()
+    except ValueError:
+        return None
+    sys_val, dia_val, bpm_val = int(sys_val), int(dia_val), int(bpm_val)
+    return {
+        "timestamp": timestamp,
+        "systolic": sys_val,
+        "diastolic": dia_val,
+        "bpm": bpm_val,
+        "classification": classify_bp(sys_val, dia_val) or "",
+    }
+
+
+def to_epoch(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+class VitalsStore:
+    def __init__(self, path=VITALS_FILE, legacy_path=LOG_FILE, compact_min_dead=50):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_min_dead = compact_min_dead
+        self.records = {}
+        # (timestamp, id) keys in ascending order. Ids follow insertion, but
+        # the clock can go backwards (no RTC before NTP, manual time changes),
+        # so paging walks this index to match the SQLite ORDER BY.
+        self._order = []
+        self._next_id = 1
+        self._dead_lines = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(record):
+        return (record["timestamp"], record["id"])
+
+    def load(self):
+        with self._lock:
+            self.records = {}
+            self._dead_lines = 0
+            if not os.path.exists(self.path) and self.legacy_path and os.path.exists(self.legacy_path):
+                self._migrate_legacy()
+
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r") as f:
+                        for line in f:
+                            line = line.strip()
+                            if not line:
+                                continue
+                            try:
+                                entry = json.loads(line)
+                            except ValueError:
+                                self._dead_lines += 1
+                                continue
+                            record_id = entry.get("id")
+                            if record_id is None:
+                                self._dead_lines += 1
+                                continue
+                            self._next_id = max(self._next_id, record_id + 1)
+                            if entry.get("deleted"):
+                                if self.records.pop(record_id, None) is not None:
+                                    self._dead_lines += 1
+                                self._dead_lines += 1
+                            else:
+                                self.records[record_id] = entry
+                except Exception as e:
+                    print(f"Error loading vitals: {e}")
+
+            self._order = sorted(self._key(r) for r in self.records.values())
+            self._maybe_compact()
+
+    def newest_first(self):
+        with self._lock:
+            return [self.records[key[1]] for key in reversed(self._order)]
+
+    def count(self):
+        return len(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def latest(self, limit, before=None):
+        with self._lock:
+            end = len(self._order) if before is None else bisect.bisect_left(self._order, tuple(before))
+            keys = self._order[max(0, end - limit):end]
+            return [self.records[key[1]] for key in reversed(keys)]
+
+    def between(self, t0, t1):
+        t0, t1 = to_epoch(t0), to_epoch(t1)
+        with self._lock:
+            return [r for r in self.records.values() if t0 <= r["timestamp"] <= t1]
+
+    def append(self, systolic, diastolic, bpm, classification="", timestamp=None):
+        with self._lock:
+            record = {
+                "id": self._next_id,
+                "timestamp": time.time() if timestamp is None else timestamp,
+                "systolic": systolic,
+                "diastolic": diastolic,
+                "bpm": bpm,
+                "classification": classification,
+            }
+            self._next_id += 1
+            self.records[record["id"]] = record
+            bisect.insort(self._order, self._key(record))
+            self._append_line(record)
+            return record
+
+    def delete(self, record_id):
+        with self._lock:
+            record = self.records.pop(record_id, None)
+            if record is None:
+                return False
+            key = self._key(record)
+            index = bisect.bisect_left(self._order, key)
+            if index < len(self._order) and self._order[index] == key:
+                del self._order[index]
+            self._append_line({"id": record_id, "deleted": True})
+            self._dead_lines += 2
+            self._maybe_compact()
+            return True
+
+    def clear(self):
+        with self._lock:
+            self.records = {}
+            self._order = []
+            self._dead_lines = 0
+            try:
+                with open(self.path, "w") as f:
+                    f.write("")
+            except Exception as e:
+                print(f"Error clearing vitals: {e}")
+
+    def compact(self):
+        with self._lock:
+            self._compact()
+
+    def close(self):
+        pass
+
+    def _append_line(self, entry):
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except Exception as e:
+            print(f"Error saving vitals: {e}")
+
+    def _maybe_compact(self):
+        if self._dead_lines >= self.compact_min_dead and self._dead_lines >= len(self.records):
+            self._compact()
+
+    def _compact(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                for record in self.records.values():
+                    f.write(json.dumps(record) + "\n")
+            os.replace(tmp_path, self.path)
+            self._dead_lines = 0
+        except Exception as e:
+            print(f"Error compacting vitals: {e}")
+
+    def _migrate_legacy(self):
+        try:
+            with open(self.legacy_path, "r") as f:
+                lines = [line.strip() for line in f if line.strip()]
+        except Exception as e:
+            print(f"Error reading legacy logs: {e}")
+            return
+
+        migrated = []
+        for line in lines:
+            record = parse_legacy_log_line(line)
+            if record:
+                migrated.append({"id": self._next_id, **record})
+                self._next_id += 1
+
+        self.records = {record["id"]: record for record in migrated}
+        self._compact()
+        print(f"Migrated {len(migrated)} readings from {self.legacy_path}")
+
+
+class SqliteVitalsStore:
+    COLUMNS = ("id", "timestamp", "systolic", "diastolic", "bpm", "classification")
+
+    def __init__(self, path=HISTORY_DB_FILE, legacy_path=LOG_FILE, jsonl_path=VITALS_FILE):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.jsonl_path = jsonl_path
+        self.conn = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS readings ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "timestamp REAL NOT NULL, "
+                "systolic INTEGER, diastolic INTEGER, bpm INTEGER, "
+                "classification TEXT)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_readings_timestamp ON readings (timestamp)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.conn.commit()
+
+            migrated = self.conn.execute("SELECT value FROM meta WHERE key = 'migrated'").fetchone()
+            if not migrated:
+                self._migrate()
+
+    def close(self):
+        with self._lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def append(self, systolic, diastolic, bpm, classification="", timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT INTO readings (timestamp, systolic, diastolic, bpm, classification) VALUES (?, ?, ?, ?, ?)",
+                (timestamp, systolic, diastolic, bpm, classification),
+            )
+            self.conn.commit()
+            return {
+                "id": cur.lastrowid,
+                "timestamp": timestamp,
+                "systolic": systolic,
+                "diastolic": diastolic,
+                "bpm": bpm,
+                "classification": classification,
+            }
+
+    def delete(self, record_id):
+        with self._lock:
+            cur = self.conn.execute("DELETE FROM readings WHERE id = ?", (record_id,))
+            self.conn.commit()
+            return cur.rowcount > 0
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM readings")
+            self.conn.commit()
+
+    def latest(self, limit, before=None):
+        query = "SELECT id, timestamp, systolic, diastolic, bpm, classification FROM readings"
+        params = []
+        if before is not None:
+            query += " WHERE timestamp < ? OR (timestamp = ? AND id < ?)"
+            params = [before[0], before[0], before[1]]
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def between(self, t0, t1):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, timestamp, systolic, diastolic, bpm, classification FROM readings "
+                "WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp, id",
+                (to_epoch(t0), to_epoch(t1)),
+            ).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def _migrate(self):
+        records = []
+        source = None
+        if self.jsonl_path and os.path.exists(self.jsonl_path):
+            store = VitalsStore(self.jsonl_path, legacy_path=None)
+            store.load()
+            records = list(store.records.values())
+            source = self.jsonl_path
+        elif self.legacy_path and os.path.exists(self.legacy_path):
+            try:
+                with open(self.legacy_path, "r") as f:
+                    for line in f:
+                        record = parse_legacy_log_line(line.strip())
+                        if record:
+                            records.append(record)
+                source = self.legacy_path
+            except Exception as e:
+                print(f"Error reading legacy logs: {e}")
+                return
+
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO readings (timestamp, systolic, diastolic, bpm, classification) VALUES (?, ?, ?, ?, ?)",
+                    [(r["timestamp"], r["systolic"], r["diastolic"], r["bpm"], r.get("classification", "")) for r in records],
+                )
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated', ?)", (source or "",))
+        except Exception as e:
+            print(f"Error migrating history: {e}")
+            return
+        if source:
+            print(f"Migrated {len(records)} readings from {source}")
+
+
+def create_vitals_store(backend=HISTORY_BACKEND):
+    if backend == "sqlite":
+        return SqliteVitalsStore(HISTORY_DB_FILE, legacy_path=LOG_FILE, jsonl_path=VITALS_FILE)
+    return VitalsStore(VITALS_FILE, legacy_path=LOG_FILE)
+
+
+class ChatTranscript:
+    def __init__(self, path=CHAT_LOG_FILE, legacy_path=CHAT_FILE, io_worker=None):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.io_worker = io_worker
+        self._messages = None
+        self._lock = threading.Lock()
+
+    @property
+    def messages(self):
+        if self._messages is None:
+            self.load()
+        return self._messages
+
+    def load(self):
+        with self._lock:
+            if self._messages is not None:
+                return
+            if not os.path.exists(self.path) and self.legacy_path and os.path.exists(self.legacy_path):
+                self._migrate_legacy()
+
+            messages = []
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r") as f:
+                        for line in f:
+                            line = line.strip()
+                            if not line:
+                                continue
+                            try:
+                                messages.append(json.loads(line))
+                            except ValueError:
+                                pass
+                except Exception as e:
+                    print(f"Error loading chat history: {e}")
+            self._messages = messages
+
+    def append(self, role, text):
+        message_data = {"role": role, "text": text, "timestamp": str(datetime.now())}
+        self.messages.append(message_data)
+        line = (json.dumps(message_data) + "\n").encode("utf-8")
+        self._run(self._write_line, line)
+        return message_data
+
+    def _run(self, fn, *args):
+        if self.io_worker:
+            self.io_worker.submit(self.path, fn, *args)
+        else:
+            fn(*args)
+
+    def _write_line(self, line):
+        with self._lock:
+            try:
+                fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                try:
+                    os.write(fd, line)
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except Exception as e:
+                print(f"Error saving chat message: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._messages = []
+        self._run(self._truncate)
+
+    def _truncate(self):
+        with self._lock:
+            try:
+                atomic_write_text(self.path, "")
+            except Exception as e:
+                print(f"Error clearing chat history: {e}")
+
+    def _migrate_legacy(self):
+        try:
+            with open(self.legacy_path, "r") as f:
+                legacy = json.load(f)
+        except Exception as e:
+            print(f"Error reading legacy chat history: {e}")
+            return
+        if not isinstance(legacy, list):
+            return
+
+        try:
+            atomic_write_text(self.path, "".join(json.dumps(message_data) + "\n" for message_data in legacy))
+            print(f"Migrated {len(legacy)} chat messages from {self.legacy_path}")
+        except Exception as e:
+            print(f"Error migrating chat history: {e}")
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback):
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
 
-mqtt_client = mqtt.Client()
+    def wait(self, timeout):
+        return self._event.wait(timeout)
 
-try:
-    mqtt_client.connect("localhost", 1883, 60)
-    mqtt_client.loop_start()
-except Exception as e:
-    print(f"MQTT Connection Error: {e}")
+
+class QueryCancelled(Exception):
+    pass
+
+
+def shutdown_socket(sock):
+    try:
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+    except Exception:
+        pass
+
+
+def abort_response(resp):
+    shutdown_socket(getattr(getattr(resp.raw, "_connection", None), "sock", None))
+    try:
+        resp.close()
+    except Exception:
+        pass
+
+
+# The CancelToken of the request the current thread is sending, if any.
+_request_cancel = threading.local()
+
+
+def make_cancellable_adapter(**kwargs):
+    # Ollama sends no headers until the first token is ready, so there is no
+    # response for abort_response to close while a query is connecting or
+    # waiting. These connections hand their socket to the sending thread's
+    # CancelToken just before they block on the headers. Built on first use
+    # so urllib3 stays unimported on the UI thread.
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class CancellableConnection:
+        _cancel = None
+
+        def getresponse(self, *args, **kw):
+            cancel = getattr(_request_cancel, "token", None)
+            self._cancel = cancel
+            if cancel is not None:
+                # A pooled connection may be serving a newer query by the
+                # time an old token is cancelled; leave that one alone.
+                cancel.on_cancel(lambda: self._cancel is cancel and shutdown_socket(self.sock))
+            return super().getresponse(*args, **kw)
+
+    class HTTPPool(HTTPConnectionPool):
+        ConnectionCls = type("CancellableHTTPConnection", (CancellableConnection, HTTPConnection), {})
+
+    class HTTPSPool(HTTPSConnectionPool):
+        ConnectionCls = type("CancellableHTTPSConnection", (CancellableConnection, HTTPSConnection), {})
+
+    class CancellableAdapter(requests.adapters.HTTPAdapter):
+        def init_poolmanager(self, *args, **kw):
+            super().init_poolmanager(*args, **kw)
+            self.poolmanager.pool_classes_by_scheme = {"http": HTTPPool, "https": HTTPSPool}
+
+    return CancellableAdapter(**kwargs)
+
+
+class OllamaStatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"Ollama returned HTTP {status_code}")
+        self.status_code = status_code
+
+
+class OllamaClient:
+    def __init__(self, host=OLLAMA_HOST, model=MODEL, connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+                 read_timeout=OLLAMA_READ_TIMEOUT, retries=OLLAMA_RETRIES, backoff=OLLAMA_RETRY_BACKOFF):
+        self.host = host.rstrip("/")
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.last_ttft = None
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        # Built on first use so importing requests stays off the UI thread.
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                session.headers["Connection"] = "keep-alive"
+                adapter = make_cancellable_adapter(pool_connections=1, pool_maxsize=4)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def warm_up(self):
+        try:
+            self.session.get(self.host, timeout=(self.connect_timeout, self.connect_timeout)).close()
+        except Exception:
+            pass
+
+    def _post_stream(self, path, payload, cancel=None):
+        attempt = 0
+        while True:
+            if cancel and cancel.cancelled:
+                raise QueryCancelled()
+            _request_cancel.token = cancel
+            try:
+                return self.session.post(
+                    self.host + path, json=payload, stream=True,
+                    timeout=(self.connect_timeout, self.read_timeout)
+                )
+            except requests.ConnectionError:
+                if cancel and cancel.cancelled:
+                    raise QueryCancelled()
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                if cancel:
+                    cancel.wait(delay)
+                else:
+                    time.sleep(delay)
+                attempt += 1
+            finally:
+                _request_cancel.token = None
+
+    def iter_stream(self, path, payload, cancel=None):
+        start = time.monotonic()
+        first = True
+        with self._post_stream(path, payload, cancel) as resp:
+            conn = getattr(resp.raw, "_connection", None)
+            if cancel:
+                cancel.on_cancel(lambda: abort_response(resp))
+            try:
+                if resp.status_code != 200:
+                    raise OllamaStatusError(resp.status_code)
+                for line in resp.iter_lines():
+                    if cancel and cancel.cancelled:
+                        raise QueryCancelled()
+                    if not line:
+                        continue
+                    try:
+                        body = json.loads(line.decode('utf-8'))
+                    except ValueError:
+                        continue
+                    if first:
+                        first = False
+                        self.last_ttft = time.monotonic() - start
+                        print(f"LLM time to first token: {self.last_ttft:.2f}s")
+                    yield body
+                    if body.get("done", False):
+                        break
+            finally:
+                # The connection goes back to the pool; a late cancel of
+                # this query must not shut it under the next one.
+                if conn is not None:
+                    conn._cancel = None
+
+    def stream_generate(self, prompt, model=None, cancel=None):
+        payload = {"model": model or self.model, "prompt": prompt, "stream": True}
+        for body in self.iter_stream("/api/generate", payload, cancel):
+            token = body.get("response", "")
+            if token:
+                yield token
+
+    def stream_chat(self, messages, model=None, cancel=None):
+        payload = {"model": model or self.model, "messages": messages, "stream": True}
+        for body in self.iter_stream("/api/chat", payload, cancel):
+            token = body.get("message", {}).get("content", "")
+            if token:
+                yield token
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+
+class PromptBuilder:
+    def __init__(self, system_prompt=SYSTEM_PROMPT, token_budget=PROMPT_TOKEN_BUDGET,
+                 max_readings=PROMPT_MAX_READINGS, max_message_chars=1200):
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.max_readings = max_readings
+        self.max_message_chars = max_message_chars
+
+    @staticmethod
+    def estimate_tokens(text):
+        return len(text) // 4 + 1
+
+    def _truncate(self, text):
+        if len(text) <= self.max_message_chars:
+            return text
+        return text[:self.max_message_chars].rstrip() + "..."
+
+    def _readings_context(self, readings):
+        if not readings:
+            return ""
+        lines = ["Patient's most recent readings (newest first):"]
+        for record in readings[:self.max_readings]:
+            stamp = datetime.fromtimestamp(record["timestamp"]).strftime("%Y-%m-%d %I:%M %p")
+            line = f"- {stamp}: {record['systolic']}/{record['diastolic']} mmHg, {record['bpm']} bpm"
+            if record.get("classification"):
+                line += f" ({record['classification']})"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def build_messages(self, history, readings=()):
+        messages = [{"role": "system", "content": self.system_prompt}]
+        remaining = self.token_budget - self.estimate_tokens(self.system_prompt)
+
+        context = self._readings_context(readings)
+        if context:
+            messages.append({"role": "system", "content": context})
+            remaining -= self.estimate_tokens(context)
+
+        turns = [
+            {"role": "user" if msg.get("role") == "user" else "assistant", "content": self._truncate(msg.get("text", ""))}
+            for msg in history if msg.get("text")
+        ]
+        kept = []
+        for turn in reversed(turns):
+            cost = self.estimate_tokens(turn["content"])
+            if kept and cost > remaining:
+                break
+            kept.append(turn)
+            remaining -= cost
+        kept.reverse()
+
+        omitted = turns[:len(turns) - len(kept)]
+        if omitted:
+            topics = [t["content"][:60].strip() for t in omitted if t["role"] == "user"][-3:]
+            summary = f"{len(omitted)} earlier messages were omitted."
+            if topics:
+                summary += " Earlier the user asked about: " + "; ".join(topics)
+            messages.append({"role": "system", "content": summary})
+
+        messages.extend(kept)
+        return messages
+
+    def build_prompt(self, history, readings=()):
+        parts = []
+        for message in self.build_messages(history, readings):
+            if message["role"] == "system":
+                parts.append(message["content"])
+            elif message["role"] == "user":
+                parts.append(f"User: {message['content']}")
+            else:
+                parts.append(f"Kairos: {message['content']}")
+        parts.append("Kairos:")
+        return "\n\n".join(parts)
+
+
+def bp_bucket(sys_val, dia_val, bpm_val):
+    sys_val, dia_val, bpm_val = int(sys_val), int(dia_val), int(bpm_val)
+    band = classify_bp(sys_val, dia_val) or "Unclassified"
+    return band, round(sys_val / 5) * 5, round(dia_val / 5) * 5, round(bpm_val / 10) * 10
+
+
+def bp_cache_key(sys_val, dia_val, bpm_val, model=MODEL):
+    band, sys_b, dia_b, bpm_b = bp_bucket(sys_val, dia_val, bpm_val)
+    return f"{model}|{band}|{sys_b}/{dia_b}|{bpm_b}"
+
+
+def bp_cache_prompt(sys_val, dia_val, bpm_val):
+    # Cached answers are replayed for every reading in the bucket, so they are
+    # generated from the bucket alone: no chat history, no stored readings.
+    band, sys_b, dia_b, bpm_b = bp_bucket(sys_val, dia_val, bpm_val)
+    return (f"My blood pressure is around {sys_b}/{dia_b} mmHg ({band}) with a heart rate of "
+            f"around {bpm_b} bpm. Is this blood pressure normal? Should I be worried? "
+            f"Describe the range rather than quoting exact numbers.")
+
+
+class ResponseCache:
+    def __init__(self, path=AI_CACHE_FILE, ttl=AI_CACHE_TTL, max_entries=AI_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = OrderedDict()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+                for key, entry in sorted(data.items(), key=lambda item: item[1].get("used", 0)):
+                    self._entries[key] = entry
+            except Exception as e:
+                print(f"Error loading AI cache: {e}")
+
+    def _save(self):
+        try:
+            atomic_write_json(self.path, self._entries)
+        except Exception as e:
+            print(f"Error saving AI cache: {e}")
+
+    def get(self, key):
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.get("created", 0) > self.ttl:
+                del self._entries[key]
+                self._save()
+                return None
+            entry["used"] = time.time()
+            self._entries.move_to_end(key)
+            return entry.get("answer")
+
+    def put(self, key, answer):
+        with self._lock:
+            self._load()
+            now = time.time()
+            self._entries[key] = {"answer": answer, "created": now, "used": now}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+
+def stream_with_deadline(tokens, deadline, job_pool, cancel=None):
+    if deadline is None:
+        for token in tokens:
+            if cancel and cancel.cancelled:
+                raise QueryCancelled()
+            yield token
+        return
+
+    items = queue.Queue()
+    if cancel:
+        cancel.on_cancel(lambda: items.put(("cancelled", None)))
+
+    def pump():
+        try:
+            for token in tokens:
+                if cancel and cancel.cancelled:
+                    break
+                items.put(("token", token))
+            items.put(("done", None))
+        except Exception as e:
+            items.put(("error", e))
+
+    job_pool.submit("stream", pump)
+    try:
+        kind, value = items.get(timeout=deadline)
+    except queue.Empty:
+        raise TimeoutError(f"No response within {deadline}s")
+    while True:
+        if kind == "cancelled" or (cancel and cancel.cancelled):
+            raise QueryCancelled()
+        if kind == "error":
+            raise value
+        if kind == "done":
+            return
+        yield value
+        kind, value = items.get()
+
+
+class OllamaResponder:
+    def __init__(self, name, client, builder, model=None, deadline=LOCAL_RESPONDER_DEADLINE, api=OLLAMA_API):
+        self.name = name
+        self.client = client
+        self.builder = builder
+        self.model = model
+        self.deadline = deadline
+        self.api = api
+
+    def respond(self, history, readings, cancel=None):
+        if self.api == "chat":
+            return self.client.stream_chat(self.builder.build_messages(history, readings), model=self.model, cancel=cancel)
+        return self.client.stream_generate(self.builder.build_prompt(history, readings), model=self.model, cancel=cancel)
+
+
+class RuleBasedResponder:
+    name = "rules"
+    deadline = None
+    BAND_ADVICE = {
+        "Optimal": "is in the optimal range. Keep up your healthy habits and continue regular checks.",
+        "Normal": "is normal. Continue your current routine and regular monitoring.",
+        "High Normal": "is high-normal. Limit salt, stay active, and recheck regularly.",
+        "Grade 1 Hypertension": "indicates Grade 1 hypertension. Rest for 5 minutes and measure again. If it stays high, consult your doctor.",
+        "Grade 2 Hypertension": "indicates Grade 2 hypertension. Take your prescribed medication and contact your doctor soon.",
+        "Grade 3 Hypertension": "indicates Grade 3 hypertension, which is very high. Sit down, rest and measure again. If it remains this high, or you have chest pain, shortness of breath, severe headache, weakness or vision changes, seek emergency care immediately.",
+        "Isolated Systolic Hypertension": "indicates isolated systolic hypertension: the upper number is high while the lower number is normal. Please discuss this with your doctor.",
+    }
+
+    def _find_reading(self, history):
+        # Only the question being answered counts; an unrelated question
+        # should not get an explanation of an older stored reading.
+        for msg in reversed(history):
+            if msg.get("role") != "user":
+                continue
+            text = msg.get("reading_text") or msg.get("text", "")
+            bp = re.search(r"(\d{2,3})\s*/\s*(\d{2,3})", text)
+            if bp:
+                hr = re.search(r"(\d{2,3})\s*bpm", text)
+                return int(bp.group(1)), int(bp.group(2)), int(hr.group(1)) if hr else None
+            break
+        return None
+
+    def explain(self, history, readings):
+        reading = self._find_reading(history)
+        if reading is None:
+            return "I can't reach the AI service right now. Please check the Wi-Fi connection, or take a blood pressure reading so I can explain it offline."
+
+        sys_val, dia_val, bpm_val = reading
+        band = classify_bp(sys_val, dia_val)
+        advice = self.BAND_ADVICE.get(band, "could not be classified. Please measure again.")
+        text = f"(Offline guidance) Your blood pressure of {sys_val}/{dia_val} mmHg {advice}"
+        if bpm_val is not None:
+            if bpm_val < 60:
+                text += f" Your heart rate of {bpm_val} bpm is below the usual resting range of 60-100 bpm."
+            elif bpm_val > 100:
+                text += f" Your heart rate of {bpm_val} bpm is above the usual resting range of 60-100 bpm."
+            else:
+                text += f" Your heart rate of {bpm_val} bpm is within the normal resting range."
+        return text
+
+    def respond(self, history, readings, cancel=None):
+        yield self.explain(history, readings)
+
+
+class ResponderChain:
+    def __init__(self, responders, job_pool):
+        self.responders = list(responders)
+        self.job_pool = job_pool
+
+    def stream(self, history, readings, info=None, cancel=None):
+        last_error = None
+        for responder in self.responders:
+            if cancel and cancel.cancelled:
+                raise QueryCancelled()
+            attempt = CancelToken()
+            if cancel:
+                cancel.on_cancel(attempt.cancel)
+            tokens = stream_with_deadline(responder.respond(history, readings, attempt), responder.deadline, self.job_pool, attempt)
+            try:
+                first = next(tokens)
+            except StopIteration:
+                continue
+            except QueryCancelled:
+                raise
+            except Exception as e:
+                attempt.cancel()
+                print(f"Responder '{responder.name}' unavailable: {e}")
+                last_error = e
+                continue
+
+            if info is not None:
+                info["responder"] = responder.name
+            yield first
+            yield from tokens
+            return
+
+        if last_error:
+            raise last_error
+
+
+class StreamBuffer:
+    def __init__(self, on_flush, interval=STREAM_FLUSH_INTERVAL, cancel=None):
+        self.on_flush = on_flush
+        self.cancel = cancel
+        self._chunks = []
+        self._done = False
+        self._finished = False
+        self._lock = threading.Lock()
+        # The Clock only holds bound methods weakly; the lambda keeps the
+        # buffer alive until a pending flush runs, even after the worker
+        # that filled it has dropped its reference.
+        self._trigger = Clock.create_trigger(lambda dt: self._flush(dt), interval)
+
+    def push(self, token):
+        if not token:
+            return
+        with self._lock:
+            if self._done:
+                return
+            self._chunks.append(token)
+        self._trigger()
+
+    def finish(self, tail=""):
+        with self._lock:
+            if self._done:
+                return
+            if tail:
+                self._chunks.append(tail)
+            self._done = True
+        self._trigger()
+
+    def _flush(self, dt):
+        with self._lock:
+            if self._finished or (self.cancel and self.cancel.cancelled):
+                return
+            text = "".join(self._chunks)
+            self._chunks = []
+            done = self._done
+            self._finished = done
+        if text or done:
+            self.on_flush(text, done)
    
    
+class AlarmScheduler:
+    def __init__(self, on_fire, store, max_sleep=ALARM_MAX_SLEEP, missed_grace=ALARM_MISSED_GRACE):
+        self.on_fire = on_fire
+        self.store = store
+        self.max_sleep = max_sleep
+        self.missed_grace = missed_grace
+        self.alarms = []
+        self._heap = []
+        self._event = None
+        self._last_wall = time.time()
+        self._last_mono = time.monotonic()
+
+    def start(self):
+        self.reload()
+
+    def stop(self):
+        if self._event:
+            self._event.cancel()
+            self._event = None
+
+    def reload(self, alarms=None):
+        if alarms is None:
+            alarms = self.store.load()
+        self.alarms = list(alarms) if isinstance(alarms, list) else []
+        self._rebuild(time.time())
+
+    def time_changed(self):
+        # The wall clock was set by hand; alarms between the old and new
+        # time are treated like ones missed during a suspend.
+        self._check()
+
+    @staticmethod
+    def next_fire(time_str, after):
+        try:
+            clock = datetime.strptime(time_str.strip().upper(), ALARM_TIME_FORMAT)
+        except ValueError:
+            return None
+        base = datetime.fromtimestamp(after)
+        fire = base.replace(hour=clock.hour, minute=clock.minute, second=0, microsecond=0)
+        if fire.timestamp() <= after:
+            fire += timedelta(days=1)
+        return fire.timestamp()
+
+    def _rebuild(self, after):
+        self._heap = []
+        for alarm in self.alarms:
+            if not alarm.get("active", True):
+                continue
+            time_str = alarm.get("time", "")
+            fire_at = self.next_fire(time_str, after)
+            if fire_at is not None:
+                self._heap.append((fire_at, time_str))
+        heapq.heapify(self._heap)
+        self._last_wall = time.time()
+        self._last_mono = time.monotonic()
+        self._schedule()
+
+    def _schedule(self):
+        if self._event:
+            self._event.cancel()
+            self._event = None
+        if not self._heap:
+            return
+        # Kivy's clock runs on monotonic time, so cap the sleep to notice
+        # suspends and wall-clock adjustments within max_sleep seconds.
+        delay = max(0, min(self._heap[0][0] - time.time(), self.max_sleep))
+        self._event = Clock.schedule_once(lambda dt: self._check(), delay)
+
+    def _check(self):
+        now = time.time()
+        elapsed = time.monotonic() - self._last_mono
+        if now < self._last_wall + elapsed - self.max_sleep:
+            # The clock moved backwards; recompute so nothing is pushed a day out.
+            self._rebuild(now)
+            return
+
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, time_str = heapq.heappop(self._heap)
+            due.append((fire_at, time_str))
+            heapq.heappush(self._heap, (self.next_fire(time_str, now), time_str))
+
+        self._last_wall = now
+        self._last_mono = time.monotonic()
+        self._schedule()
+
+        fresh = [time_str for fire_at, time_str in due if now - fire_at <= self.missed_grace]
+        for fire_at, time_str in due:
+            if now - fire_at > self.missed_grace:
+                print(f"Missed alarm {time_str} ({int((now - fire_at) // 60)} min late)")
+        if fresh:
+            # Several alarms coming due together raise a single alert.
+            self.on_fire(fresh[-1].strip().upper())
+
+
+
+class OnScreenKeyboard:
+    PAGES = [
+        [
+            ["q","w","e","r","t","y","u","i","o","p"],
+            ["a","s","d","f","g","h","j","k","l"],
+            ["SHIFT","z","x","c","v","b","n","m","CAPS"],
+            ["MORE","CLEAR","SPACE","BACK"]
+        ],
+        [
+            ["1","2","3","4","5","6","7","8","9","0"],
+            ["-","/",":",";","(",")","$","&","@","\""],
+            [".",",","?","!","'","\"","+","=","_","*"],
+            ["MAIN","CLEAR","SPACE","BACK"]
+        ],
+    ]
+    KEY_BG = (0.9, 0.9, 0.9, 1)
+    ACTIVE_BG = (0.0, 0.6, 0.6, 1)
+    PRESSED_BG = (0.0, 0.8, 0.8, 1)
+    WIDE_KEYS = ["SHIFT", "CAPS", "MORE", "MAIN", "BACK", "CLEAR"]
+
+    def __init__(self, container, get_target, accept_key=None):
+        self.container = container
+        self.get_target = get_target
+        self.accept_key = accept_key
+        self.page = 0
+        self.caps_enabled = False
+        self.shift_enabled = False
+        self.pages_built = 0
+        self._pages = {}
+        self._shown_page = None
+
+    def show(self, page=None):
+        if page is not None:
+            self.page = page
+        if self.page not in self._pages:
+            self._pages[self.page] = self._build_page(self.page)
+        if self._shown_page != self.page:
+            self.container.clear_widgets()
+            for row in self._pages[self.page][0]:
+                self.container.add_widget(row)
+            self._shown_page = self.page
+        self._relabel()
+
+    def reset(self):
+        self.caps_enabled = False
+        self.shift_enabled = False
+        self.show(0)
+
+    def _build_page(self, page):
+        self.pages_built += 1
+        rows = []
+        keys = []
+        for row_keys in self.PAGES[page]:
+            row = BoxLayout(spacing=4, padding=(2,0))
+            for key in row_keys:
+                w_hint = 1.0
+                if key == "SPACE": w_hint = 2.5
+                elif key in self.WIDE_KEYS: w_hint = 1.3
+
+                btn = Button(
+                    text=key, font_size=12, size_hint_x=w_hint,
+                    background_normal='', background_color=self.KEY_BG, color=(0.2, 0.2, 0.2, 1)
+                )
+                btn.bind(on_release=partial(self.press, key))
+                row.add_widget(btn)
+                keys.append((key, btn))
+            rows.append(row)
+        return rows, keys
+
+    def _style(self, key, btn):
+        active = (key == "SHIFT" and self.shift_enabled) or (key == "CAPS" and self.caps_enabled)
+        btn.background_color = self.ACTIVE_BG if active else self.KEY_BG
+        btn.color = (1, 1, 1, 1) if active else (0.2, 0.2, 0.2, 1)
+
+    def _relabel(self):
+        is_capitalized = self.caps_enabled or self.shift_enabled
+        for key, btn in self._pages[self.page][1]:
+            if self.page == 0 and len(key) == 1 and key.isalpha():
+                btn.text = key.upper() if is_capitalized else key
+            elif key in ("SHIFT", "CAPS"):
+                self._style(key, btn)
+
+    def press(self, key, btn, *args):
+        if self.accept_key and not self.accept_key(key):
+            return
+
+        btn.background_color = self.PRESSED_BG
+        Clock.schedule_once(lambda dt: self._style(key, btn), 0.1)
+
+        ti = self.get_target()
+        if not ti: return
+
+        if key=="SPACE": ti.text+=" "; return
+        if key=="BACK": ti.text=ti.text[:-1]; return
+        if key=="CLEAR": ti.text=""; return
+        if key=="CAPS":
+            self.caps_enabled = not self.caps_enabled
+            self._relabel()
+            return
+        if key=="SHIFT":
+            self.shift_enabled = not self.shift_enabled
+            self._relabel()
+            return
+        if key=="MORE": self.show(1); return
+        if key=="MAIN": self.show(0); return
+
+        if len(key) == 1:
+            ti.text += btn.text if key.isalpha() else key
+            if self.shift_enabled and not self.caps_enabled:
+                self.shift_enabled = False
+                self._relabel()
+
+
+
 class BlackScreen(Screen):
     def on_enter(self):
         Clock.schedule_once(lambda dt: self.switch_to_welcome(), 1.5)
@@ -106,7 +2633,6 @@ class WelcomeScreen(Screen):
 class MenuScreen(Screen):
     _last_click = 0
     clock_event = None
-    wifi_check_event = None
 
     def go_to_settings(self):
         if time.time() - self._last_click < 0.05: return
@@ -118,17 +2644,14 @@ class MenuScreen(Screen):
         self.update_clock(0)
         self.clock_event = Clock.schedule_interval(self.update_clock, 1)
         
-        self.check_wifi_status(0)
-        self.wifi_check_event = Clock.schedule_interval(self.check_wifi_status, 5)
+        App.get_running_app().network_status.subscribe(self._update_wifi_button)
 
 
     def on_leave(self):
         if self.clock_event:
             self.clock_event.cancel()
             self.clock_event = None
-        if self.wifi_check_event:
-            self.wifi_check_event.cancel()
-            self.wifi_check_event = None
+        App.get_running_app().network_status.unsubscribe(self._update_wifi_button)
 
 
     def update_clock(self, dt):
@@ -143,57 +2666,7 @@ class MenuScreen(Screen):
             pass
    
    
-    def check_wifi_status(self, dt):
-        threading.Thread(target=self._perform_wifi_check, daemon=True).start()
-
-
-    def _perform_wifi_check(self):
-        is_connected = False
-        signal_level = 0
-        try:
-            if platform.system() == "Windows":
-                try:
-                    output = subprocess.check_output("netsh wlan show interfaces", shell=True, timeout=3).decode(errors='ignore')
-                    if "State" in output and "connected" in output:
-                        is_connected = True
-                        for line in output.splitlines():
-                            if "Signal" in line:
-                                sig_str = line.split(":")[-1].strip().replace('%', '')
-                                try:
-                                    signal_level = int(sig_str)
-                                except:
-                                    signal_level = 100
-                                break
-                except: pass
-            else:
-                try:
-                    output = subprocess.check_output(["sudo", "/usr/bin/nmcli", "-t", "-f", "ACTIVE,SIGNAL", "dev", "wifi"], timeout=3).decode('utf-8', errors='ignore')
-                    for line in output.splitlines():
-                        if line.startswith("yes:"):
-                            is_connected = True
-                            parts = line.split(":")
-                            if len(parts) > 1:
-                                try:
-                                    signal_level = int(parts[1])
-                                except:
-                                    signal_level = 100
-                            break
-                    
-                    if not is_connected:
-                        output2 = subprocess.check_output(["sudo", "/usr/bin/nmcli", "-t", "-f", "DEVICE,STATE", "dev"], timeout=3).decode('utf-8', errors='ignore')
-                        for line in output2.splitlines():
-                            if ("wlan" in line or "wifi" in line) and ":connected" in line:
-                                is_connected = True
-                                signal_level = 75 
-                                break
-                except: pass
-        except Exception as e:
-            print(f"Wifi Check Error: {e}")
-        finally:
-            Clock.schedule_once(partial(self._update_wifi_button, is_connected, signal_level), 0)
-
-
-    def _update_wifi_button(self, is_connected, signal_level, dt):
+    def _update_wifi_button(self, is_connected, signal_level):
         status_text = "CONNECTED" if is_connected else "NOT CONNECTED"
         color_hex = "00FF00" if is_connected else "FF5555"
         
@@ -205,13 +2678,8 @@ class MenuScreen(Screen):
         if self.ids.get("ai_btn"):
             self.ids.ai_btn.text = f"[size=18][b]AI ASSISTANT[/b][/size]\n[size=12]Interactive Chat Module\nSystem Status: [color={ai_color}]{ai_status}[/color][/size]"
 
-        strength = 0
-        if is_connected:
-            if signal_level > 80: strength = 4
-            elif signal_level > 60: strength = 3
-            elif signal_level > 30: strength = 2
-            else: strength = 1
-            
+        strength = max(signal_bars(signal_level), 1) if is_connected else 0
+
         if "menu_wifi_icon" in self.ids:
             self.ids.menu_wifi_icon.strength = strength
             
@@ -266,7 +2734,7 @@ class MenuScreen(Screen):
             print("Simulating Shutdown...")
             App.get_running_app().stop()
         else:
-            threading.Thread(target=lambda: os.system("sudo shutdown now")).start()
+            App.get_running_app().job_pool.submit("system", os.system, "sudo shutdown now", key="power")
 
 
     def exec_reboot(self, instance):
@@ -274,18 +2742,16 @@ class MenuScreen(Screen):
         if platform.system() == "Windows":
             print("Simulating Reboot...")
         else:
-            threading.Thread(target=lambda: os.system("sudo reboot")).start()
+            App.get_running_app().job_pool.submit("system", os.system, "sudo reboot", key="power")
 
 
 class WifiScreen(Screen):
     scanning = False
-    caps_enabled = False
-    shift_enabled = False
-    keyboard_page = 0
     _last_key_down = None 
     _last_key_time = 0.0
     _last_click = 0.0
     selected_ssid = ""
+    keyboard = None
     cached_networks = []  
     expanded_ssid = None  
 
@@ -293,15 +2759,33 @@ class WifiScreen(Screen):
     def __init__(self, **kwargs):
         super(WifiScreen, self).__init__(**kwargs)
         self.selected_ssid = ""
+        self._network_rows = {}
 
     
     def on_enter(self):
         self.ids.wifi_sm.current = "list"
         if self.ids.wifi_switch.active:
-            self.scan_wifi()
+            self.scanning = True
+            App.get_running_app().wifi_scanner.subscribe(self._on_scan_results)
+            if self.scanning:
+                self.ids.wifi_status.text = "Scanning for networks..."
         else:
             self.ids.wifi_status.text = "Wi-Fi is disabled."
-            self.ids.wifi_list_layout.clear_widgets()
+            self._clear_network_rows()
+
+
+    def on_leave(self):
+        App.get_running_app().wifi_scanner.unsubscribe(self._on_scan_results)
+
+
+    def _on_scan_results(self, networks, scanned_at):
+        scanner = App.get_running_app().wifi_scanner
+        if scanner.last_error is not None and not networks:
+            self.scanning = False
+            self._update_status("Scan Error")
+            return
+        self.cached_networks = networks
+        self._render_network_list()
 
 
     def go_back_menu(self):
@@ -312,21 +2796,24 @@ class WifiScreen(Screen):
         if is_active:
             self.ids.wifi_status.text = "Enabling Wi-Fi..."
             self._set_system_wifi(True)
+            App.get_running_app().wifi_scanner.set_enabled(True)
+            App.get_running_app().wifi_scanner.subscribe(self._on_scan_results)
             self.scan_wifi()
         else:
             self.ids.wifi_status.text = "Wi-Fi is turned off."
-            self.ids.wifi_list_layout.clear_widgets()
+            self._clear_network_rows()
+            App.get_running_app().wifi_scanner.unsubscribe(self._on_scan_results)
+            App.get_running_app().wifi_scanner.set_enabled(False)
+            self.cached_networks = []
             self._set_system_wifi(False)
             self.scanning = False
 
 
     def _set_system_wifi(self, turn_on):
-        if platform.system() != "Windows":
-            state = "on" if turn_on else "off"
-            try:
-                subprocess.run(["sudo", "/usr/bin/nmcli", "radio", "wifi", state])
-            except Exception:
-                pass
+        try:
+            App.get_running_app().wifi_backend.set_radio(turn_on)
+        except Exception as e:
+            print(f"Wifi Radio Error: {e}")
 
 
     def scan_wifi(self):
@@ -337,185 +2824,172 @@ class WifiScreen(Screen):
 
         self.scanning = True
         self.expanded_ssid = None 
-        self.ids.wifi_status.text = "Scanning for networks..."
-        self.ids.wifi_list_layout.clear_widgets()
-        threading.Thread(target=self._perform_scan, daemon=True).start()
-
-
-    def _perform_scan(self):
-        networks_data = []
-        found_ssids = set()
-        system = platform.system()
-        
-        try:
-            if system == "Windows":
-                try:
-                    cmd = subprocess.check_output("netsh wlan show networks mode=bssid", shell=True, timeout=5)
-                    decoded = cmd.decode('utf-8', errors='ignore')
-                    for line in decoded.split('\n'):
-                        if "SSID" in line and ":" in line:
-                            parts = line.split(":", 1)
-                            ssid = parts[1].strip()
-                            if ssid and ssid not in found_ssids:
-                                networks_data.append({'ssid': ssid, 'active': False})
-                                found_ssids.add(ssid)
-                except subprocess.TimeoutExpired:
-                    pass
-            else:
-                try:
-                    subprocess.run(["sudo", "/usr/bin/nmcli", "device", "wifi", "rescan"], timeout=5)
-                except Exception:
-                    pass
-                
-                try:
-                    cmd = subprocess.check_output(["sudo", "/usr/bin/nmcli", "-t", "-f", "ACTIVE,SSID", "dev", "wifi", "list"], timeout=10)
-                    decoded = cmd.decode('utf-8', errors='ignore')
-                    for line in decoded.split('\n'):
-                        if ":" in line:
-                            active_str, ssid = line.split(":", 1)
-                            ssid = ssid.strip()
-                            is_active = (active_str.lower() == 'yes')
-                            
-                            if ssid and ssid not in found_ssids and "--" not in ssid:
-                                networks_data.append({'ssid': ssid, 'active': is_active})
-                                found_ssids.add(ssid)
-                except subprocess.TimeoutExpired:
-                    pass
-                            
-        except Exception as e:
-            Clock.schedule_once(lambda dt: self._update_status(f"Scan Error"), 0)
-            self.scanning = False
-            return
-
-        networks_data.sort(key=lambda x: (not x['active'], x['ssid']))
-        self.cached_networks = networks_data
-        Clock.schedule_once(lambda dt: self._render_network_list(), 0)
+        if not self.cached_networks:
+            self.ids.wifi_status.text = "Scanning for networks..."
+        App.get_running_app().wifi_scanner.refresh(force=True)
 
 
     def _update_status(self, text):
         self.ids.wifi_status.text = text
 
 
-    def _render_network_list(self):
+    def _clear_network_rows(self):
         self.ids.wifi_list_layout.clear_widgets()
+        self._network_rows = {}
+
+
+    def _render_network_list(self):
         self.scanning = False
         
         if not self.ids.wifi_switch.active:
             self.ids.wifi_status.text = "Wi-Fi is turned off."
+            self._clear_network_rows()
             return
 
         if not self.cached_networks:
             self.ids.wifi_status.text = "No networks found."
+            self._clear_network_rows()
             return
 
-        self.ids.wifi_status.text = f"Found {len(self.cached_networks)} networks."
-        
+        age = App.get_running_app().wifi_scanner.age() or 0
+        self.ids.wifi_status.text = f"Found {len(self.cached_networks)} networks (updated {int(age)}s ago)."
+
+        # Rows are keyed by SSID and only rebuilt when what they display
+        # changes; untouched rows keep their widgets and canvas. Signal is
+        # compared in bars, so small fluctuations between scans are free.
+        rows = {}
+        desired = []
         for net in self.cached_networks:
             ssid = net['ssid']
-            is_active = net['active']
+            state = (net['active'], net.get('security', ""), signal_bars(net.get('signal', 0)),
+                     self.expanded_ssid == ssid)
+            entry = self._network_rows.get(ssid)
+            if entry is None or entry[0] != state:
+                entry = (state, self._build_network_row(net, self.expanded_ssid == ssid))
+            rows[ssid] = entry
+            desired.append(entry[1])
+
+        self._network_rows = rows
+        self._sync_network_rows(desired)
+
+
+    def _sync_network_rows(self, desired):
+        layout = self.ids.wifi_list_layout
+        keep = set(id(w) for w in desired)
+        for widget in list(layout.children):
+            if id(widget) not in keep:
+                layout.remove_widget(widget)
+
+        # Kivy stores children last-drawn first, so display position
+        # ``pos`` lives at ``children[len - 1 - pos]``.
+        for pos, widget in enumerate(desired):
+            children = layout.children
+            slot = len(children) - 1 - pos
+            if 0 <= slot < len(children) and children[slot] is widget:
+                continue
+            if widget.parent is layout:
+                layout.remove_widget(widget)
+            layout.add_widget(widget, index=len(layout.children) - pos)
+
+
+    def _build_network_row(self, net, expanded):
+        ssid = net['ssid']
+        is_active = net['active']
+
+        if expanded:
+            box = BoxLayout(orientation='vertical', size_hint_y=None, height="110dp", spacing=0)
             
-            if self.expanded_ssid == ssid:
-                box = BoxLayout(orientation='vertical', size_hint_y=None, height="110dp", spacing=0)
-                
-                with box.canvas.before:
-                    Color(0.9, 1, 0.9, 1) 
-                    RoundedRectangle(pos=box.pos, size=box.size, radius=[6,])
-                
-                def update_canvas(instance, value):
-                    instance.canvas.before.clear()
-                    with instance.canvas.before:
-                        Color(0.9, 1, 0.9, 1)
-                        RoundedRectangle(pos=instance.pos, size=instance.size, radius=[6,])
-                box.bind(pos=update_canvas, size=update_canvas)
-
-                btn_top = Button(
-                    text=f"{ssid} (Connected)",
-                    background_normal='',
-                    background_color=(0,0,0,0), 
-                    color=(0, 0.6, 0.2, 1),
-                    bold=True,
-                    font_size=14,
-                    size_hint_y=0.6
-                )
-                btn_top.bind(on_release=lambda x, s=ssid: self.toggle_expand(s))
-
-                btn_container = BoxLayout(padding=[40, 5, 40, 10], size_hint_y=0.4)
-                btn_action = Button(
-                    text="DISCONNECT",
-                    background_normal='',
-                    background_color=(0.8, 0.3, 0.3, 1), 
-                    color=(1, 1, 1, 1),
-                    bold=True,
-                    font_size=12
-                )
-                btn_action.bind(on_release=lambda x, s=ssid: self.disconnect_wifi(s))
-                
-                btn_container.add_widget(btn_action)
-                box.add_widget(btn_top)
-                box.add_widget(btn_container)
-                self.ids.wifi_list_layout.add_widget(box)
+            with box.canvas.before:
+                Color(0.9, 1, 0.9, 1) 
+                box_bg = RoundedRectangle(pos=box.pos, size=box.size, radius=[6,])
+            
+            def update_canvas(instance, value):
+                box_bg.pos = instance.pos
+                box_bg.size = instance.size
+            box.bind(pos=update_canvas, size=update_canvas)
 
-            else:
-                text_col = (0, 0.6, 0.2, 1) if is_active else (0.2, 0.2, 0.2, 1)
-                bg_col = (0.9, 1, 0.9, 1) if is_active else (0.95, 0.95, 0.95, 1)
-                label_text = f"{ssid} (Connected)" if is_active else ssid
+            btn_top = Button(
+                text=f"{ssid} (Connected)",
+                background_normal='',
+                background_color=(0,0,0,0), 
+                color=(0, 0.6, 0.2, 1),
+                bold=True,
+                font_size=14,
+                size_hint_y=0.6
+            )
+            btn_top.bind(on_release=lambda x, s=ssid: self.toggle_expand(s))
 
-                btn = Button(
-                    text=label_text,
-                    size_hint_y=None,
-                    height="45dp",
-                    background_normal='',
-                    background_color=bg_col,
-                    color=text_col,
-                    bold=is_active,
-                    font_size=12
-                )
-                
-                if is_active:
-                    btn.bind(on_release=lambda x, s=ssid: self.toggle_expand(s))
-                else:
-                    btn.bind(on_release=partial(self.prepare_connection, ssid))
-                
-                self.ids.wifi_list_layout.add_widget(btn)
+            btn_container = BoxLayout(padding=[40, 5, 40, 10], size_hint_y=0.4)
+            btn_action = Button(
+                text="DISCONNECT",
+                background_normal='',
+                background_color=(0.8, 0.3, 0.3, 1), 
+                color=(1, 1, 1, 1),
+                bold=True,
+                font_size=12
+            )
+            btn_action.bind(on_release=lambda x, s=ssid: self.disconnect_wifi(s))
+            
+            btn_container.add_widget(btn_action)
+            box.add_widget(btn_top)
+            box.add_widget(btn_container)
+            return box
+
+        text_col = (0, 0.6, 0.2, 1) if is_active else (0.2, 0.2, 0.2, 1)
+        bg_col = (0.9, 1, 0.9, 1) if is_active else (0.95, 0.95, 0.95, 1)
+        label_text = f"{ssid} (Connected)" if is_active else ssid
+        bars = signal_bars(net.get('signal', 0))
+        details = [d for d in (net.get('security'), f"Signal {bars}/4" if bars else "") if d]
+        if details:
+            label_text = f"{label_text}  -  {'  '.join(details)}"
+
+        btn = Button(
+            text=label_text,
+            size_hint_y=None,
+            height="45dp",
+            background_normal='',
+            background_color=bg_col,
+            color=text_col,
+            bold=is_active,
+            font_size=12
+        )
+        
+        if is_active:
+            btn.bind(on_release=lambda x, s=ssid: self.toggle_expand(s))
+        else:
+            btn.bind(on_release=partial(self.prepare_connection, ssid))
+        return btn
 
 
     def toggle_expand(self, ssid):
-        if self.expanded_ssid == ssid:
-            self.expanded_ssid = None 
-        else:
-            self.expanded_ssid = ssid 
+        self.expanded_ssid = None if self.expanded_ssid == ssid else ssid
+        # Only the collapsed and expanded rows change state, so the diff in
+        # _render_network_list rebuilds those two and leaves the rest alone.
         self._render_network_list()
 
 
     def disconnect_wifi(self, ssid):
         self.ids.wifi_status.text = f"Disconnecting {ssid}..."
-        threading.Thread(target=self._perform_disconnect, args=(ssid,), daemon=True).start()
+        App.get_running_app().job_pool.submit("wifi_connect", self._perform_disconnect, ssid, key=f"disconnect:{ssid}")
 
 
     def _perform_disconnect(self, ssid):
-        if platform.system() != "Windows":
-            try:
-                subprocess.run(["sudo", "/usr/bin/nmcli", "connection", "down", "id", ssid], capture_output=True, timeout=10)
-            except Exception as e:
-                pass
+        try:
+            App.get_running_app().wifi_backend.disconnect(ssid)
+        except Exception as e:
+            pass
+        App.get_running_app().network_status.invalidate()
         Clock.schedule_once(lambda dt: self.scan_wifi(), 1.0)
 
 
     def has_saved_profile(self, ssid):
-        if platform.system() == "Windows":
-            return False 
-        try:
-            output = subprocess.check_output(["sudo", "/usr/bin/nmcli", "-g", "NAME", "connection", "show"], timeout=2).decode('utf-8')
-            profiles = output.strip().split('\n')
-            return ssid in profiles
-        except:
-            return False
+        return App.get_running_app().network_status.has_saved_profile(ssid)
 
 
     def prepare_connection(self, ssid, instance):
         if self.has_saved_profile(ssid):
             self.ids.wifi_status.text = f"Connecting to saved network: {ssid}..."
-            threading.Thread(target=self._perform_saved_connection, args=(ssid,), daemon=True).start()
+            App.get_running_app().job_pool.submit("wifi_connect", self._perform_saved_connection, ssid, key=f"connect:{ssid}")
             return
         self._show_password_screen(ssid)
 
@@ -532,11 +3006,7 @@ class WifiScreen(Screen):
             self.ids.btn_show_pass.color = (0.2, 0.2, 0.2, 1)
 
         self.ids.wifi_sm.current = "password"
-        
-        self.caps_enabled = False
-        self.shift_enabled = False
-        self.keyboard_page = 0
-        self.build_keyboard()
+        self.build_keyboard().reset()
 
 
     def toggle_show_password(self):
@@ -561,13 +3031,12 @@ class WifiScreen(Screen):
     def _perform_saved_connection(self, ssid):
         success = False
         try:
-            res = subprocess.run(["sudo", "/usr/bin/nmcli", "connection", "up", "id", ssid], capture_output=True, timeout=15)
-            if res.returncode == 0:
-                success = True
+            success = App.get_running_app().wifi_backend.connect_saved(ssid)
         except Exception as e:
             pass
         
         if success:
+            App.get_running_app().network_status.invalidate()
             Clock.schedule_once(lambda dt: self.scan_wifi(), 2.0)
         else:
             Clock.schedule_once(lambda dt: self._prompt_password_fallback(ssid), 0)
@@ -588,7 +3057,7 @@ class WifiScreen(Screen):
         password = self.ids.pass_input.text
         self.ids.wifi_sm.current = "list"
         self.ids.wifi_status.text = f"Connecting to {ssid}..."
-        threading.Thread(target=self._perform_connection, args=(ssid, password), daemon=True).start()
+        App.get_running_app().job_pool.submit("wifi_connect", self._perform_connection, ssid, password, key=f"connect:{ssid}")
 
 
     def _perform_connection(self, ssid, password):
@@ -599,129 +3068,33 @@ class WifiScreen(Screen):
                 Clock.schedule_once(lambda dt: self._update_status("Windows: Connect manually."), 0)
                 return
             else:
-                try:
-                    subprocess.run(["sudo", "/usr/bin/nmcli", "connection", "delete", "id", ssid], capture_output=True, timeout=5)
-                except subprocess.TimeoutExpired:
-                    pass
-
-                cmd_add = [
-                    "sudo", "/usr/bin/nmcli", "connection", "add",
-                    "type", "wifi",
-                    "con-name", ssid,
-                    "ifname", "wlan0", 
-                    "ssid", ssid,
-                    "802-11-wireless-security.key-mgmt", "wpa-psk",
-                    "802-11-wireless-security.psk", password
-                ]
-                
-                result_add = subprocess.run(cmd_add, capture_output=True, text=True, timeout=15)
-                
-                if result_add.returncode == 0:
-                    cmd_up = ["sudo", "/usr/bin/nmcli", "connection", "up", ssid]
-                    result_up = subprocess.run(cmd_up, capture_output=True, text=True, timeout=15)
-                    
-                    if result_up.returncode == 0:
-                        success = True
+                success = App.get_running_app().wifi_backend.connect(ssid, password)
         except Exception as e:
             pass
         
+        App.get_running_app().network_status.invalidate()
         Clock.schedule_once(lambda dt: self.scan_wifi(), 2.0)
 
 
     def build_keyboard(self, dt=None):
-        layout = self.ids.wifi_keyboard
-        layout.clear_widgets()
-        
-        if self.keyboard_page == 0:
-            rows = [
-                ["q","w","e","r","t","y","u","i","o","p"],
-                ["a","s","d","f","g","h","j","k","l"],
-                ["SHIFT","z","x","c","v","b","n","m","CAPS"],
-                ["MORE","CLEAR","SPACE","BACK"]
-            ]
-        else:
-            rows = [
-                ["1","2","3","4","5","6","7","8","9","0"],
-                ["-","/",":",";","(",")","$","&","@","\""],
-                [".",",","?","!","'","\"","+","=","_","*"],
-                ["MAIN","CLEAR","SPACE","BACK"]
-            ]
-        
-        key_bg = (0.9, 0.9, 0.9, 1)
-        for row_keys in rows:
-            row = BoxLayout(spacing=4, padding=(2,0))
-            for key in row_keys:
-                display_text = key
-                current_bg = list(key_bg)
-                is_capitalized = self.caps_enabled or self.shift_enabled
-                if self.keyboard_page == 0 and key.isalpha():
-                    display_text = key.upper() if is_capitalized else key.lower()
-                
-                if key == "SHIFT":
-                    if self.shift_enabled: current_bg = [0.0, 0.6, 0.6, 1]
-                elif key == "CAPS":
-                    if self.caps_enabled: current_bg = [0.0, 0.6, 0.6, 1]
-
-                w_hint = 1.0
-                if key == "SPACE": w_hint = 2.5
-                elif key in ["SHIFT", "CAPS", "MORE", "MAIN", "BACK", "CLEAR"]: w_hint = 1.3
-                
-                text_col = (0.2, 0.2, 0.2, 1)
-                if current_bg[0] < 0.5: text_col = (1,1,1,1)
-
-                btn = Button(
-                    text=display_text, font_size=12, size_hint_x=w_hint,
-                    background_normal='', background_color=current_bg, color=text_col
-                )
-                btn.bind(on_release=partial(self.on_key_press, key, btn))
-                row.add_widget(btn)
-                if key=="SHIFT": self.shift_button = btn
-                if key=="CAPS": self.caps_button = btn
-            layout.add_widget(row)
+        if self.keyboard is None:
+            self.keyboard = OnScreenKeyboard(self.ids.wifi_keyboard, lambda: self.ids.pass_input, self._accept_key)
+        return self.keyboard
 
 
-    def on_key_press(self, key_name, instance, *args):
+    def _accept_key(self, key_name):
         now = time.time()
         
         if now - self._last_key_time < 0.1:
-            return
+            return False
 
         if key_name == getattr(self, '_last_key_down', None):
             if now - self._last_key_time < 0.3:
-                return
+                return False
 
         self._last_key_down = key_name
         self._last_key_time = now
-        
-        orig_color = instance.background_color
-        instance.background_color = (0.0, 0.8, 0.8, 1)
-        if key_name not in ["SHIFT", "CAPS"] or not (self.shift_enabled or self.caps_enabled):
-             Clock.schedule_once(lambda dt: setattr(instance, 'background_color', orig_color), 0.1)
-        
-        key = key_name
-        ti = self.ids.pass_input
-        
-        if key=="SPACE": ti.text+=" "; return
-        if key=="BACK": ti.text=ti.text[:-1]; return
-        if key=="CLEAR": ti.text=""; return
-        if key=="CAPS":
-            self.caps_enabled = not self.caps_enabled
-            self.build_keyboard()
-            return
-        if key=="SHIFT":
-            self.shift_enabled = not self.shift_enabled
-            self.build_keyboard()
-            return
-        if key=="MORE": self.keyboard_page=1; self.build_keyboard(); return
-        if key=="MAIN": self.keyboard_page=0; self.build_keyboard(); return
-        
-        if len(key) == 1:
-            is_capitalized = (self.caps_enabled or self.shift_enabled) and self.keyboard_page == 0
-            ch = instance.text if key.isalpha() else key
-            ti.text += ch
-            if self.shift_enabled and not self.caps_enabled:
-                self.shift_enabled = False
-                self.build_keyboard()
+        return True
 
 
 
@@ -735,12 +3108,10 @@ class VitalSignsScreen(Screen):
     is_monitoring = False
     has_unsaved_data = False
     _last_click = 0
-    ser = None
     
     auto_action_event = None    
 
     def on_enter(self):
-        self.stop_thread = False
         app = App.get_running_app()
         
         if "btn_take_medicine" in self.ids:
@@ -778,13 +3149,16 @@ class VitalSignsScreen(Screen):
             self.ids.classification.text = "----"
             self.ids.classification.color = (0, 0, 0, 1)
 
-        threading.Thread(target=self.read_arduino_data, daemon=True).start()
+        if app.serial_manager:
+            app.serial_manager.subscribe(self.on_serial_frame)
+        if not app.serial_manager or not app.serial_manager.is_open:
+            Clock.schedule_once(partial(self.update_labels, "Err", "Err", "Err"), 0)
 
     def on_leave(self):
-        self.stop_thread = True
         self.is_monitoring = False
-        if self.ser and self.ser.is_open:
-            self.ser.close()
+        app = App.get_running_app()
+        if app.serial_manager:
+            app.serial_manager.unsubscribe(self.on_serial_frame)
         
         if self.auto_action_event:
             self.auto_action_event.cancel()
@@ -840,9 +3214,9 @@ class VitalSignsScreen(Screen):
         self.ids.vitals_bpm.text = "-HEART RATE-"
         self.ids.classification.text = "----"
         
-        if self.ser and self.ser.is_open:
-            try: self.ser.write(b"START\n")
-            except Exception as e: print(f"Serial Write Error: {e}")
+        app = App.get_running_app()
+        if app.serial_manager:
+            app.serial_manager.write(b"START\n")
 
     def stop_scanning_manual(self):
         if self.auto_action_event:
@@ -853,14 +3227,13 @@ class VitalSignsScreen(Screen):
         self.has_unsaved_data = False
         self._set_exit_buttons_state(disabled=False)
         
-        if self.ser and self.ser.is_open:
-            try: self.ser.write(b"STOP\n")
-            except Exception as e: print(f"Serial Write Error: {e}")
+        app = App.get_running_app()
+        if app.serial_manager:
+            app.serial_manager.write(b"STOP\n")
             
         self.ids.btn_scan.text = "START\nMONITORING"
         self.ids.btn_scan.background_color = (0.2, 0.6, 1, 1)
         
-        app = App.get_running_app()
         if app.medication_pending and not app.can_take_medicine:
             self.ids.vitals_status.text = "TAKE BP FIRST TO UNLOCK MEDICINE"
             self.ids.vitals_status.color = (0.9, 0.6, 0.1, 1)
@@ -898,28 +3271,10 @@ class VitalSignsScreen(Screen):
             self.auto_action_event.cancel()
         self.auto_action_event = Clock.schedule_once(self.trigger_auto_action, 10.0)
 
-    def read_arduino_data(self):
-        try:
-            self.ser = serial.Serial('/dev/ttyACM0', 9600, timeout=1)
-            time.sleep(2)
-
-            while not self.stop_thread:
-                if self.ser.in_waiting > 0:
-                    try:
-                        line = self.ser.readline().decode('utf-8').strip()
-                        if line and line != "Err":
-                            try:
-                                self.bp_sys, self.bp_dia, self.bp_bpm = line.split("=")
-                                if self.is_monitoring:
-                                    Clock.schedule_once(partial(self.update_labels, self.bp_sys, self.bp_dia, self.bp_bpm), 0)
-                            except ValueError:
-                                pass
-                    except Exception:
-                        pass
-                time.sleep(0.1)
-
-        except Exception as e:
-            Clock.schedule_once(partial(self.update_labels, "Err", "Err", "Err"), 0)
+    def on_serial_frame(self, sys_val, dia_val, bpm_val):
+        self.bp_sys, self.bp_dia, self.bp_bpm = sys_val, dia_val, bpm_val
+        if self.is_monitoring:
+            Clock.schedule_once(partial(self.update_labels, sys_val, dia_val, bpm_val), 0)
 
     def update_labels(self, temp_val, temp_dia, temp_bpm, dt):
         if temp_val == "Err" or temp_dia == "Err" or temp_bpm == "Err":
@@ -932,32 +3287,14 @@ class VitalSignsScreen(Screen):
             self.ids.vitals_bpm.text = f"{temp_bpm}"
             
             try:
-                sys = int(temp_val)
-                dia = int(temp_dia)
-                if sys < 120 and dia < 80:
-                    self.ids.classification.text = "Optimal"
-                    self.ids.classification.color = (0.07, 0.5, 0.17, 1)
-                elif 120 <= sys <= 129 or 80 <= dia <= 84:
-                    self.ids.classification.text = "Normal"
-                    self.ids.classification.color = (0.07, 0.5, 0.17, 1)
-                elif 130 <= sys <= 139 or 85 <= dia <= 89:
-                    self.ids.classification.text = "High Normal"
-                    self.ids.classification.color = (0.07, 0.5, 0.17, 1)
-                elif 140 <= sys <= 159 or 90 <= dia <= 99:
-                    self.ids.classification.text = "Grade 1 Hypertension"
-                    self.ids.classification.color = (0.8, 0.3, 0.3, 1)
-                elif 160 <= sys <= 179 or 100 <= dia <= 109:
-                    self.ids.classification.text = "Grade 2 Hypertension"
-                    self.ids.classification.color = (0.8, 0.3, 0.3, 1)
-                elif sys > 180 or dia > 110:
-                    self.ids.classification.text = "Grade 3 Hypertension"
-                    self.ids.classification.color = (0.8, 0.3, 0.3, 1)
-                elif sys > 140 and dia < 90:
-                    self.ids.classification.text = "Isolated Systolic Hypertension"
-                    self.ids.classification.color = (0.8, 0.3, 0.3, 1)
-                elif sys < 0:
-                    self.ids.classification.text = "Error. Try Again"
-                    self.ids.classification.color = (0.8, 0.3, 0.3, 1)
+                label = classify_bp(int(temp_val), int(temp_dia))
+                if label:
+                    self.ids.classification.text = label
+                    if label in ("Optimal", "Normal", "High Normal"):
+                        self.ids.classification.color = (0.07, 0.5, 0.17, 1)
+                    else:
+                        self.ids.classification.color = (0.8, 0.3, 0.3, 1)
+                if label == "Error. Try Again":
                     self.ids.vitals_temp.text = "Error"
                     self.ids.vitals_dia.text = "Error"
                     self.ids.vitals_bpm.text = "Error"
@@ -982,26 +3319,18 @@ class VitalSignsScreen(Screen):
         temp_val = self.bp_sys
         dia_val = self.bp_dia
         bpm_val = self.bp_bpm
-        now = datetime.now()        
-        timestamp = now.strftime("%Y-%m-%d  %I:%M %p")
-        entry = f"[{timestamp}]       Blood Pressure: {temp_val}/{dia_val}mmHg       Heart Rate:  {bpm_val}bpm"
         
         app = App.get_running_app()
-        app.saved_history.insert(0, entry)
-        
         try:
-            with open(LOG_FILE, "a") as f:
-                f.write(entry + "\n")
-        except Exception as e:
-            pass
+            reading = (int(temp_val), int(dia_val), int(bpm_val), self.ids.classification.text)
+            app.io_worker.submit(app.vitals_store.path, app.vitals_store.append, *reading)
+        except ValueError:
+            print(f"Invalid reading not saved: {temp_val}/{dia_val} {bpm_val}")
 
-        if self.ser and self.ser.is_open:
-            try:
-                self.ser.write(b"SEND\n")
-                sms_cmd = f"SMS:{TARGET_PHONE_NUMBER}:{temp_val}/{dia_val} BP {bpm_val} BPM\n"
-                self.ser.write(sms_cmd.encode('utf-8'))
-            except Exception as e:
-                pass
+        if app.serial_manager:
+            app.serial_manager.write(b"SEND\n")
+            sms_cmd = f"SMS:{TARGET_PHONE_NUMBER}:{temp_val}/{dia_val} BP {bpm_val} BPM\n"
+            app.serial_manager.write(sms_cmd)
 
         self.is_monitoring = False
         self.has_unsaved_data = False
@@ -1015,6 +3344,8 @@ class VitalSignsScreen(Screen):
         else:
             self.ids.vitals_status.text = "SAVED! CONSULTING AI..."
             self.ids.vitals_status.color = (0.07, 0.5, 0.17, 1)
+            if app.llm_client:
+                app.job_pool.submit("llm", app.llm_client.warm_up, key="warm_up")
             Clock.schedule_once(partial(self.redirect_to_ai, temp_val, dia_val, bpm_val), 1.0)
             send_vitals_to_dashboard(temp_val, dia_val, bpm_val, self.ids.classification.text)
 
@@ -1028,77 +3359,107 @@ class VitalSignsScreen(Screen):
         self.manager.current = "chat"
         chat_screen = self.manager.get_screen("chat")
         query = f"I just measured a blood pressure of {temp_val}/{dia_val} mmHg with a heart rate of {bpm_val} bpm. Is this blood pressure normal? Should I be worried?"
-        Clock.schedule_once(lambda dt: chat_screen.trigger_automated_query(query), 0.5)
+        try:
+            cache_key = bp_cache_key(temp_val, dia_val, bpm_val, App.get_running_app().llm_client.model)
+            cache_prompt = bp_cache_prompt(temp_val, dia_val, bpm_val)
+        except (ValueError, AttributeError):
+            cache_key = cache_prompt = None
+        Clock.schedule_once(lambda dt: chat_screen.trigger_automated_query(query, cache_key, cache_prompt), 0.5)
 
 
 
 class HistoryRow(BoxLayout):
     text_content = StringProperty("")
+    record_id = NumericProperty(0)
     
-    def __init__(self, text_content="", **kwargs):
+    def __init__(self, text_content="", record_id=0, **kwargs):
         super().__init__(**kwargs)
         self.text_content = text_content
+        self.record_id = record_id
 
 
 
 class HistoryScreen(Screen):
     _last_click = 0 
+    _page_cursor = None
+    _has_more = False
+    _loading = False
+    _generation = 0
+
+    def _reset_pages(self):
+        # Pages still in flight for an older view are dropped on arrival.
+        self._generation += 1
+        self._loading = False
+        self._page_cursor = None
+        self._has_more = False
+        self.ids.history_rv.data = []
 
     def on_enter(self):
+        rv = self.ids.history_rv
+        self._reset_pages()
+        rv.scroll_y = 1
+        self._show_empty_state(False)
+        self.load_next_page()
+
+    def _submit(self, fn, *args):
+        # Reads share the I/O worker with writes so they always see saves
+        # and deletes that were queued before them.
         app = App.get_running_app()
-        self.ids.history_grid.clear_widgets()
-        
-        if not app.saved_history:
-            lbl = Label(
-                text="No patient records found.",
-                color=(0.5, 0.5, 0.5, 1),
-                size_hint_y=None,
-                height="50dp",
-                font_size="16sp"
-            )
-            self.ids.history_grid.add_widget(lbl)
-            if "btn_clear_db" in self.ids: self.ids.btn_clear_db.disabled = True
+        app.io_worker.submit(app.vitals_store.path, fn, *args)
+
+    def _show_empty_state(self, is_empty):
+        self.ids.history_empty.opacity = 1 if is_empty else 0
+        if "btn_clear_db" in self.ids: self.ids.btn_clear_db.disabled = is_empty
+
+    def load_next_page(self):
+        if self._loading: return
+        self._loading = True
+        self._submit(self._read_page, App.get_running_app().vitals_store, self._generation, self._page_cursor)
+
+    def _read_page(self, store, generation, cursor):
+        records = store.latest(HISTORY_PAGE_SIZE, before=cursor)
+        Clock.schedule_once(lambda dt: self._show_page(generation, records), 0)
+
+    def _show_page(self, generation, records):
+        if generation != self._generation:
             return
+        self._loading = False
+        data = self.ids.history_rv.data
+        data.extend(
+            {"text_content": format_reading(record), "record_id": record["id"]} for record in records
+        )
+        if records:
+            self._page_cursor = (records[-1]["timestamp"], records[-1]["id"])
+        self._has_more = len(records) == HISTORY_PAGE_SIZE
+        self._show_empty_state(not data)
 
-        if "btn_clear_db" in self.ids: self.ids.btn_clear_db.disabled = False
-        
-        for record in app.saved_history:
-            row = HistoryRow(text_content=record)
-            self.ids.history_grid.add_widget(row)
+    def on_history_scroll(self, scroll_y):
+        if self._has_more and scroll_y <= 0.05:
+            self.load_next_page()
 
     def delete_record(self, row_widget):
         app = App.get_running_app()
-        text_to_delete = row_widget.text_content
-        
-        if text_to_delete in app.saved_history:
-            app.saved_history.remove(text_to_delete)
-            
-        self.ids.history_grid.remove_widget(row_widget)
-        
-        try:
-            with open(LOG_FILE, "w") as f:
-                for line in reversed(app.saved_history):
-                    f.write(line + "\n")
-        except Exception as e:
-            pass
+        record_id = row_widget.record_id
+        self._submit(app.vitals_store.delete, record_id)
+
+        data = self.ids.history_rv.data
+        for index, item in enumerate(data):
+            if item["record_id"] == record_id:
+                data.pop(index)
+                break
             
-        if not app.saved_history:
-            lbl = Label(
-                text="No patient records found.",
-                color=(0.5, 0.5, 0.5, 1),
-                size_hint_y=None,
-                height="50dp",
-                font_size="16sp"
-            )
-            self.ids.history_grid.add_widget(lbl)
-            if "btn_clear_db" in self.ids: self.ids.btn_clear_db.disabled = True
+        if data:
+            return
+        if self._has_more:
+            self.load_next_page()
+        else:
+            self._show_empty_state(True)
 
     def clear_history(self):
         if time.time() - self._last_click < 1.0: return
         self._last_click = time.time()
 
-        app = App.get_running_app()
-        if not app.saved_history: return
+        if not self.ids.history_rv.data: return
 
         content = Factory.ConfirmPopup()
         content.ids.confirm_msg.text = "Are you sure you want to\ndelete ALL patient logs?"
@@ -1121,61 +3482,59 @@ class HistoryScreen(Screen):
         self.popup.dismiss()
         app = App.get_running_app()
         
-        app.saved_history.clear()
-        
-        try:
-            with open(LOG_FILE, "w") as f:
-                f.write("")
-        except Exception:
-            pass
-
-        self.ids.history_grid.clear_widgets()
-        lbl = Label(
-            text="No patient records found.",
-            color=(0.5, 0.5, 0.5, 1),
-            size_hint_y=None,
-            height="50dp",
-            font_size="16sp"
-        )
-        self.ids.history_grid.add_widget(lbl)
-        
-        if "btn_clear_db" in self.ids:
-            self.ids.btn_clear_db.disabled = True
+        self._submit(app.vitals_store.clear)
+        self._reset_pages()
+        self._show_empty_state(True)
 
 
 
 class WindowManager(ScreenManager):
-    pass
+    LAZY_SCREENS = {
+        "menu": "MenuScreen",
+        "vitals": "VitalSignsScreen",
+        "history": "HistoryScreen",
+        "chat": "ChatScreen",
+        "wifi": "WifiScreen",
+        "settings": "SettingsScreen",
+        "datetime": "DateTimeScreen",
+        "alarm": "AlarmScreen",
+        "pill_management": "PillManagementScreen",
+    }
+
+    def get_screen(self, name):
+        # Screens are built the first time they are navigated to.
+        if name in self.LAZY_SCREENS and not self.has_screen(name):
+            started = time.perf_counter()
+            self.add_widget(Factory.get(self.LAZY_SCREENS[name])())
+            print(f"Built screen '{name}' in {(time.perf_counter() - started) * 1000:.1f}ms")
+        return super().get_screen(name)
     
     
     
 class ChatScreen(Screen):
     debounce_active = False
-    caps_enabled = False
-    shift_enabled = False
-    keyboard_page = 0
+    keyboard = None
     _last_key_down = None 
     _last_key_time = 0.0
-    shift_button = None
-    caps_button = None
     thinking_event = None
     type_event = None
     current_ai_text_accumulator = ""
+    _oldest_rendered = None
+    _synced_count = 0
+    _loading_older = False
+    _active_query = None
 
 
     def on_enter(self):
-        self.ids.messages_layout.clear_widgets()
         self.build_keyboard()
+        self.keyboard.show()
         Clock.schedule_once(self.force_input_style, 0.1)
         self.load_saved_messages()
-        
-        app = App.get_running_app()
-        if not app.chat_history:
-            self.add_medical_greeting()
-        
         self.check_online_status()
 
     def on_leave(self):
+        self.cancel_active_query()
+        App.get_running_app().network_status.unsubscribe(self._update_status_label)
         if self.thinking_event:
             self.thinking_event.cancel()
             self.thinking_event = None
@@ -1184,32 +3543,12 @@ class ChatScreen(Screen):
             self.type_event = None
 
     def check_online_status(self):
-        if "ai_status_label" in self.ids:
+        network_status = App.get_running_app().network_status
+        if "ai_status_label" in self.ids and not network_status.checked_at:
             self.ids.ai_status_label.text = "Checking connection..."
-        threading.Thread(target=self._check_wifi_thread, daemon=True).start()
+        network_status.subscribe(self._update_status_label)
 
-    def _check_wifi_thread(self):
-        is_connected = False
-        try:
-            if platform.system() == "Windows":
-                 try:
-                    output = subprocess.check_output("netsh wlan show interfaces", shell=True, timeout=2).decode(errors='ignore')
-                    if "State" in output and "connected" in output:
-                        is_connected = True
-                 except: pass
-            else:
-                try:
-                    output = subprocess.check_output(["sudo", "/usr/bin/nmcli", "-t", "-f", "DEVICE,STATE", "dev"], timeout=2).decode('utf-8', errors='ignore')
-                    for line in output.splitlines():
-                        if "wlan" in line or "wifi" in line:
-                             if ":connected" in line:
-                                 is_connected = True
-                                 break
-                except: pass
-        except: pass
-        Clock.schedule_once(partial(self._update_status_label, is_connected), 0)
-
-    def _update_status_label(self, is_connected, dt):
+    def _update_status_label(self, is_connected, signal_level=0):
         lbl = self.ids.get("ai_status_label")
         if lbl:
             if is_connected:
@@ -1237,6 +3576,8 @@ class ChatScreen(Screen):
     def clear_chat_history(self):
         self.ids.messages_layout.clear_widgets()
         App.get_running_app().clear_chat_data()
+        self._oldest_rendered = 0
+        self._synced_count = 0
         self.add_medical_greeting()
     
     def go_back_menu(self):
@@ -1253,51 +3594,84 @@ class ChatScreen(Screen):
         lbl.bind(height=lambda inst, h: setattr(bubble, 'height', h + 25))
         return lbl
 
+    def _make_bubble(self, kind, text, color):
+        try: bubble = Factory.get(kind)()
+        except Exception:
+            bubble = BoxLayout(size_hint_y=None, padding=10)
+        lbl = self._create_label_for_bubble(bubble, text, color=color)
+        bubble.add_widget(lbl)
+        return bubble, lbl
+
+    def _make_message_bubble(self, msg):
+        if msg['role'] == 'user':
+            bubble, _ = self._make_bubble("UserBubble", msg['text'], (0.1, 0.2, 0.4, 1))
+        else:
+            bubble, _ = self._make_bubble("ChatBubble", msg['text'], (0.2, 0.2, 0.2, 1))
+        return bubble
+
+    def _mark_synced(self):
+        self._synced_count = len(App.get_running_app().chat_history)
+
     def load_saved_messages(self):
         app = App.get_running_app()
-        for msg in app.chat_history:
-            if msg['role'] == 'user':
-                self.add_user_message(msg['text'], save=False)
-            else:
-                self.add_assistant_bubble_static(msg['text'])
+        history = app.chat_history
+        layout = self.ids.messages_layout
+
+        if self._oldest_rendered is None:
+            layout.clear_widgets()
+            self._oldest_rendered = max(0, len(history) - CHAT_PAGE_SIZE)
+            for msg in history[self._oldest_rendered:]:
+                layout.add_widget(self._make_message_bubble(msg))
+            if not history:
+                self.add_medical_greeting()
+        else:
+            for msg in history[self._synced_count:]:
+                layout.add_widget(self._make_message_bubble(msg))
+
+        self._synced_count = len(history)
+        Clock.schedule_once(lambda dt: self.scroll_to_bottom(), 0.02)
+
+    def load_older_messages(self):
+        if not self._oldest_rendered or self._loading_older:
+            return
+        self._loading_older = True
+
+        history = App.get_running_app().chat_history
+        layout = self.ids.messages_layout
+        anchor = layout.children[-1] if layout.children else None
+        start = max(0, self._oldest_rendered - CHAT_PAGE_SIZE)
+
+        for msg in reversed(history[start:self._oldest_rendered]):
+            layout.add_widget(self._make_message_bubble(msg), index=len(layout.children))
+        self._oldest_rendered = start
+
+        def restore_position(dt):
+            sv = getattr(self.ids, "messages_scroll", None)
+            if sv and anchor is not None:
+                sv.scroll_to(anchor, padding=0, animate=False)
+            self._loading_older = False
+        Clock.schedule_once(restore_position, 0.05)
+
+    def on_messages_scroll(self, scroll_y):
+        if scroll_y >= 0.98 and self._oldest_rendered:
+            self.load_older_messages()
 
     def add_assistant_bubble_static(self, text):
-        from kivy.factory import Factory
-        try: bubble = Factory.ChatBubble()
-        except Exception:
-            from kivy.uix.boxlayout import BoxLayout
-            bubble = BoxLayout(size_hint_y=None, padding=10)
-        
-        lbl = self._create_label_for_bubble(bubble, text, color=(0.2, 0.2, 0.2, 1))
-        bubble.add_widget(lbl)
+        bubble, _ = self._make_bubble("ChatBubble", text, (0.2, 0.2, 0.2, 1))
         self.ids.messages_layout.add_widget(bubble)
         Clock.schedule_once(lambda dt: self.scroll_to_bottom(), 0.02)
 
     def add_user_message(self, text, save=True):
-        from kivy.factory import Factory
-        try: bubble = Factory.UserBubble()
-        except Exception:
-            from kivy.uix.boxlayout import BoxLayout
-            bubble = BoxLayout(size_hint_y=None, padding=10)
-        
-        display_text = f"{text}"
-        lbl = self._create_label_for_bubble(bubble, display_text, color=(0.1, 0.2, 0.4, 1))
-        bubble.add_widget(lbl)
+        bubble, _ = self._make_bubble("UserBubble", f"{text}", (0.1, 0.2, 0.4, 1))
         self.ids.messages_layout.add_widget(bubble)
         Clock.schedule_once(lambda dt: self.scroll_to_bottom(), 0.02)
         
         if save:
             App.get_running_app().save_chat_message("user", text)
+            self._mark_synced()
 
     def add_assistant_placeholder(self):
-        from kivy.factory import Factory
-        try: bubble = Factory.ChatBubble()
-        except Exception:
-            from kivy.uix.boxlayout import BoxLayout
-            bubble = BoxLayout(size_hint_y=None, padding=10)
-        
-        lbl = self._create_label_for_bubble(bubble, "Analyzing input.", color=(0.4, 0.4, 0.4, 1))
-        bubble.add_widget(lbl)
+        bubble, lbl = self._make_bubble("ChatBubble", "Analyzing input.", (0.4, 0.4, 0.4, 1))
         self.ids.messages_layout.add_widget(bubble)
         Clock.schedule_once(lambda dt: self.scroll_to_bottom(), 0.02)
         return bubble, lbl
@@ -1311,7 +3685,27 @@ class ChatScreen(Screen):
         self.trigger_automated_query(text)
         prompt.text = ""
 
-    def trigger_automated_query(self, text):
+    def cancel_active_query(self):
+        token = self._active_query
+        self._active_query = None
+        if token is None or token.cancelled:
+            return
+        token.cancel()
+
+        if self.thinking_event:
+            self.thinking_event.cancel()
+            self.thinking_event = None
+        self.is_thinking = False
+
+        partial_text = self.current_ai_text_accumulator
+        if partial_text:
+            App.get_running_app().save_chat_message("assistant", partial_text)
+            self._mark_synced()
+        elif hasattr(self, "assistant_label"):
+            self.assistant_label.text = "Stopped."
+
+    def trigger_automated_query(self, text, cache_key=None, cache_prompt=None):
+        self.cancel_active_query()
         self.add_user_message(text, save=True)
         
         self.assistant_bubble, self.assistant_label = self.add_assistant_placeholder()
@@ -1323,7 +3717,10 @@ class ChatScreen(Screen):
         if self.thinking_event: self.thinking_event.cancel()
         self.thinking_event = Clock.schedule_interval(self._thinking_step, 0.5)
         
-        threading.Thread(target=self._query_ollama, args=(text,), daemon=True).start()
+        cancel = CancelToken()
+        self._active_query = cancel
+        stream = StreamBuffer(self._process_stream_chunk, STREAM_FLUSH_INTERVAL, cancel)
+        App.get_running_app().job_pool.submit("llm", self._query_ollama, text, stream, cache_key, cache_prompt)
 
     def _thinking_step(self, dt):
         self.thinking_dots = (self.thinking_dots + 1) % 4
@@ -1333,37 +3730,53 @@ class ChatScreen(Screen):
         Clock.schedule_once(lambda dt: self.scroll_to_bottom(), 0)
         return True
 
-    def _query_ollama(self, prompt):
-        medical_prompt = f"You are a helpful AI Assistant. Your name is Kairos. Answer concisely and professionally. User asks: {prompt}"
-        payload = {"model": MODEL, "prompt": medical_prompt, "stream": True}
+    def _query_ollama(self, prompt, stream, cache_key=None, cache_prompt=None):
+        app = App.get_running_app()
+        builder = app.prompt_builder
+        if not cache_prompt or not app.response_cache:
+            cache_key = None
+
+        if cache_key:
+            cached = app.response_cache.get(cache_key)
+            if cached:
+                stream.push(cached)
+                stream.finish()
+                return
         
         try:
-            with requests.post(OLLAMA_URL, json=payload, stream=True, timeout=60) as resp:
-                if resp.status_code == 200:
-                    for line in resp.iter_lines():
-                        if line:
-                            try:
-                                body = json.loads(line.decode('utf-8'))
-                                token = body.get("response", "")
-                                done = body.get("done", False)
-                                
-                                if token:
-                                    Clock.schedule_once(partial(self._process_stream_chunk, token, False), 0)
-                                
-                                if done:
-                                    Clock.schedule_once(partial(self._process_stream_chunk, "", True), 0)
-                                    break
-                            except Exception as e:
-                                pass
-                else:
-                    err_msg = f"System Error: {resp.status_code}"
-                    Clock.schedule_once(partial(self._process_stream_chunk, err_msg, True), 0)
+            if cache_key:
+                # The offline rules still explain the exact reading.
+                history, readings = [{"role": "user", "text": cache_prompt, "reading_text": prompt}], []
+            else:
+                history = list(app.chat_history)
+                if not history or history[-1].get("role") != "user" or history[-1].get("text") != prompt:
+                    history.append({"role": "user", "text": prompt})
+                readings = app.vitals_store.latest(builder.max_readings) if app.vitals_store else []
+
+            info = {}
+            answer = []
+            for token in app.responder_chain.stream(history, readings, info, stream.cancel):
+                answer.append(token)
+                stream.push(token)
+            stream.finish()
+
+            if cache_key and answer and info.get("responder") == "remote":
+                app.response_cache.put(cache_key, "".join(answer))
+
+        except QueryCancelled:
+            pass
+
+        except OllamaStatusError as e:
+            if not stream.cancel.cancelled:
+                err_msg = f"System Error: {e.status_code}"
+                stream.finish(err_msg)
 
         except Exception as e:
-            err_msg = f"Network Error. Please check connection."
-            Clock.schedule_once(partial(self._process_stream_chunk, err_msg, True), 0)
+            if not stream.cancel.cancelled:
+                err_msg = f"Network Error. Please check connection."
+                stream.finish(err_msg)
 
-    def _process_stream_chunk(self, token, is_done, dt):
+    def _process_stream_chunk(self, text, is_done):
         if self.is_thinking:
             if self.thinking_event:
                 self.thinking_event.cancel()
@@ -1371,14 +3784,16 @@ class ChatScreen(Screen):
             self.assistant_label.text = ""
             self.is_thinking = False
 
-        self.assistant_label.text += token
-        self.current_ai_text_accumulator += token
-        
-        Clock.schedule_once(lambda dt: self.scroll_to_bottom(), 0)
+        if text:
+            self.current_ai_text_accumulator += text
+            self.assistant_label.text = self.current_ai_text_accumulator
+            self.scroll_to_bottom()
         
         if is_done:
+            self._active_query = None
             clean_text = self.current_ai_text_accumulator
             App.get_running_app().save_chat_message("assistant", clean_text)
+            self._mark_synced()
 
     def scroll_to_bottom(self):
         sv = getattr(self.ids, "messages_scroll", None)
@@ -1386,99 +3801,21 @@ class ChatScreen(Screen):
             sv.scroll_y = 0
 
     def build_keyboard(self, dt=None):
-        layout = getattr(self.ids, "keyboard_layout", None)
-        if not layout: return
-        layout.clear_widgets()
-        self.shift_button = None
-        self.caps_button = None
-        
-        if self.keyboard_page == 0:
-            rows = [
-                ["q","w","e","r","t","y","u","i","o","p"],
-                ["a","s","d","f","g","h","j","k","l"],
-                ["SHIFT","z","x","c","v","b","n","m","CAPS"],
-                ["MORE","CLEAR","SPACE","BACK"]
-            ]
-        else:
-            rows = [
-                ["1","2","3","4","5","6","7","8","9","0"],
-                ["-","/",":",";","(",")","$","&","@","\""],
-                [".",",","?","!","'","\"","+","=","_","*"],
-                ["MAIN","CLEAR","SPACE","BACK"]
-            ]
-        
-        key_bg = (0.9, 0.9, 0.9, 1) 
-        for row_keys in rows:
-            row = BoxLayout(spacing=4, padding=(2,0))
-            for key in row_keys:
-                display_text = key
-                current_bg = list(key_bg)
-                is_capitalized = self.caps_enabled or self.shift_enabled
-                if self.keyboard_page == 0 and key.isalpha():
-                    display_text = key.upper() if is_capitalized else key.lower()
-                
-                if key == "SHIFT":
-                    if self.shift_enabled: current_bg = [0.0, 0.6, 0.6, 1]
-                elif key == "CAPS":
-                    if self.caps_enabled: current_bg = [0.0, 0.6, 0.6, 1]
-
-                w_hint = 1.0
-                if key == "SPACE": w_hint = 2.5
-                elif key in ["SHIFT", "CAPS", "MORE", "MAIN", "BACK", "CLEAR"]: w_hint = 1.3
-                
-                text_col = (0.2, 0.2, 0.2, 1)
-                if current_bg[0] < 0.5: text_col = (1,1,1,1)
-
-                btn = Button(
-                    text=display_text, font_size=12, size_hint_x=w_hint,
-                    background_normal='', background_color=current_bg, color=text_col
-                )
-                btn.bind(on_release=partial(self.on_key_press, key, btn))
-                row.add_widget(btn)
-                if key=="SHIFT": self.shift_button = btn
-                if key=="CAPS": self.caps_button = btn
-            layout.add_widget(row)
+        if self.keyboard is None:
+            self.keyboard = OnScreenKeyboard(
+                self.ids.keyboard_layout, lambda: getattr(self.ids, "input_field", None), self._accept_key
+            )
+        return self.keyboard
 
-    def on_key_press(self, key_name, instance, *args):
-        now = time.time()
-        
+    def _accept_key(self, key_name):
         if self.debounce_active:
-            return
+            return False
         self.debounce_active = True
         Clock.schedule_once(self.enable_button, 0.2)
         
         self._last_key_down = key_name
-        self._last_key_time = now
-        
-        orig_color = instance.background_color
-        instance.background_color = (0.0, 0.8, 0.8, 1)
-        if key_name not in ["SHIFT", "CAPS"] or not (self.shift_enabled or self.caps_enabled):
-             Clock.schedule_once(lambda dt: setattr(instance, 'background_color', orig_color), 0.1)
-        
-        key = key_name
-        ti = getattr(self.ids, "input_field", None)
-        if not ti: return
-            
-        if key=="SPACE": ti.text+=" "; return
-        if key=="BACK": ti.text=ti.text[:-1]; return
-        if key=="CLEAR": ti.text=""; return
-        if key=="CAPS":
-            self.caps_enabled = not self.caps_enabled
-            self.build_keyboard() 
-            return
-        if key=="SHIFT":
-            self.shift_enabled = not self.shift_enabled
-            self.build_keyboard() 
-            return
-        if key=="MORE": self.keyboard_page=1; self.build_keyboard(); return
-        if key=="MAIN": self.keyboard_page=0; self.build_keyboard(); return
-        
-        if len(key) == 1:
-            ch = instance.text if key.isalpha() else key
-            ti.text += ch
-            if self.shift_enabled and not self.caps_enabled:
-                self.shift_enabled = False
-                self.build_keyboard() 
+        self._last_key_time = time.time()
+        return True
 
     def enable_button(self, dt):
         self.debounce_active = False
@@ -1582,6 +3919,7 @@ class DateTimeScreen(Screen):
                 os.system("sudo hwclock -w") 
             except Exception as e:
                 print(f"Error setting time: {e}")
+            App.get_running_app().alarm_scheduler.time_changed()
         
         self.manager.current = "settings"
 
@@ -1634,21 +3972,12 @@ class AlarmScreen(Screen):
         self.manager.current = "settings"
 
     def load_alarms(self):
-        if os.path.exists(ALARM_FILE):
-            try:
-                with open(ALARM_FILE, "r") as f:
-                    self.alarm_list = json.load(f)
-            except:
-                self.alarm_list = []
-        else:
-            self.alarm_list = []
+        self.alarm_list = list(App.get_running_app().alarm_scheduler.alarms)
 
     def save_alarms(self):
-        try:
-            with open(ALARM_FILE, "w") as f:
-                json.dump(self.alarm_list, f, indent=4)
-        except Exception as e:
-            print(f"Error saving alarms: {e}")
+        app = App.get_running_app()
+        app.alarm_store.save(self.alarm_list)
+        app.alarm_scheduler.reload(self.alarm_list)
 
     def render_alarms(self):
         grid = self.ids.alarm_grid
@@ -1740,11 +4069,14 @@ class AlarmScreen(Screen):
 
 
 class PagtultolApp(App):
-    saved_history = []
-    chat_history = []
+    vitals_store = None
+    llm_client = None
+    prompt_builder = None
+    response_cache = None
+    responder_chain = None
+    chat_transcript = None
     _last_click_time = 0.0
     _is_warning_open = False
-    last_triggered_time = "" 
     buzzer_event = None
     buzzer_state = False
     _alert_popup = None
@@ -1752,23 +4084,25 @@ class PagtultolApp(App):
     pill_count = NumericProperty(1) 
     medication_pending = BooleanProperty(False) 
     can_take_medicine = BooleanProperty(False) 
-    arduino_serial = None
+    serial_manager = None
+    job_pool = None
+    network_status = None
+    wifi_backend = None
+    wifi_scanner = None
+    alarm_scheduler = None
+    alarm_store = None
+    inventory_store = None
+    io_worker = None
+    mqtt_publisher = None
+    telemetry = None
 
     def load_inventory(self):
-        if os.path.exists(INVENTORY_FILE):
-            try:
-                with open(INVENTORY_FILE, "r") as f:
-                    data = json.load(f)
-                    self.pill_count = data.get("pill_count", 1)
-            except Exception as e:
-                print(f"Error loading inventory: {e}")
+        data = self.inventory_store.load()
+        if isinstance(data, dict):
+            self.pill_count = data.get("pill_count", 1)
 
     def save_inventory(self):
-        try:
-            with open(INVENTORY_FILE, "w") as f:
-                json.dump({"pill_count": self.pill_count}, f)
-        except Exception as e:
-            print(f"Error saving inventory: {e}")
+        self.inventory_store.save({"pill_count": self.pill_count})
 
     def check_debounce(self, wait_time=0.5):
         current_time = time.time()
@@ -1778,26 +4112,92 @@ class PagtultolApp(App):
         return True 
 
     def build(self):
+        STARTUP.mark("imports")
+        Builder.load_file(resource_path("new design.kv"))
+        STARTUP.mark("kv parsed")
+
+        self.job_pool = JobPool(JOB_POOL_LIMITS)
+        self.io_worker = IOWorker()
+        self.alarm_store = JsonDocument(ALARM_FILE, [], self.io_worker, indent=4)
+        self.inventory_store = JsonDocument(INVENTORY_FILE, {"pill_count": 1}, self.io_worker)
         self.load_inventory() 
 
-        if os.path.exists(LOG_FILE):
-            try:
-                with open(LOG_FILE, "r") as f:
-                    lines = [line.strip() for line in f.readlines() if line.strip()]
-                    self.saved_history = lines[::-1]
-            except Exception as e:
-                print(f"Error loading logs: {e}")
-
-        if os.path.exists(CHAT_FILE):
-            try:
-                with open(CHAT_FILE, "r") as f:
-                    self.chat_history = json.load(f)
-            except Exception as e:
-                self.chat_history = []
-
         sm = WindowManager(transition=FadeTransition(duration=0.1))
+        STARTUP.mark("splash built")
         return sm 
 
+    def on_start(self):
+        Window.bind(on_flip=self._on_first_frame)
+
+    def _on_first_frame(self, *args):
+        Window.unbind(on_flip=self._on_first_frame)
+        STARTUP.mark("first frame")
+        Clock.schedule_once(self._start_services, 0)
+
+    def _start_services(self, dt):
+        # Everything below runs after the splash is on screen. Only cheap
+        # object setup happens here; anything touching disk, D-Bus, the tty
+        # or an optional import is handed to the background workers.
+        STARTUP.expect("history loaded", "chat loaded", "wifi backend ready", "serial started",
+                       "mqtt started", "telemetry started")
+        self.network_status = NetworkStatusService(self.job_pool, None, NETWORK_POLL_INTERVAL)
+        self.wifi_scanner = WifiScanService(self.job_pool, None, WIFI_SCAN_INTERVAL)
+        # Scans share the single wifi_scan worker, so any scan requested
+        # meanwhile runs after the backend is in place.
+        self.job_pool.submit("wifi_scan", self._start_in_background, "wifi backend ready", self._start_wifi_backend)
+        self.alarm_scheduler = AlarmScheduler(self.trigger_medical_alert, self.alarm_store)
+
+        self.vitals_store = create_vitals_store(HISTORY_BACKEND)
+        self.io_worker.submit(self.vitals_store.path, self._start_in_background, "history loaded", self.vitals_store.load)
+        # mqtt_publisher and telemetry stay None until these finish; their
+        # callers already skip them while unset.
+        self.io_worker.submit(MQTT_QUEUE_FILE, self._start_in_background, "mqtt started", self._start_mqtt)
+        self.io_worker.submit(TELEMETRY_STATE_FILE, self._start_in_background, "telemetry started", self._start_telemetry)
+
+        self.chat_transcript = ChatTranscript(CHAT_LOG_FILE, legacy_path=CHAT_FILE, io_worker=self.io_worker)
+        # Parsed before the first chat visit so it doesn't stall on the file.
+        self.io_worker.submit(self.chat_transcript.path, self._start_in_background, "chat loaded", self.chat_transcript.load)
+        self.llm_client = OllamaClient(OLLAMA_HOST, MODEL)
+        self.prompt_builder = PromptBuilder(SYSTEM_PROMPT, PROMPT_TOKEN_BUDGET)
+        self.response_cache = ResponseCache(AI_CACHE_FILE, AI_CACHE_TTL, AI_CACHE_MAX_ENTRIES)
+        self.responder_chain = ResponderChain([
+            OllamaResponder("remote", self.llm_client, self.prompt_builder, MODEL, REMOTE_RESPONDER_DEADLINE),
+            OllamaResponder("local", self.llm_client, self.prompt_builder, LOCAL_MODEL, LOCAL_RESPONDER_DEADLINE),
+            RuleBasedResponder(),
+        ], self.job_pool)
+
+        self.serial_manager = SerialManager(self.job_pool, SERIAL_PORT, SERIAL_BAUDRATE)
+        self.job_pool.submit("system", self._start_in_background, "serial started", self.serial_manager.start)
+        self.network_status.start()
+        self.alarm_scheduler.start()
+        STARTUP.mark("services started")
+
+    def _start_in_background(self, label, fn):
+        try:
+            fn()
+        finally:
+            STARTUP.done(label)
+
+    def _start_wifi_backend(self):
+        backend = create_wifi_backend(WIFI_BACKEND)
+        self.wifi_backend = backend
+        self.network_status.wifi_backend = backend
+        self.wifi_scanner.wifi_backend = backend
+        Clock.schedule_once(lambda dt: self.wifi_scanner.start(), 0)
+
+    def _start_mqtt(self):
+        publisher = MqttPublisher(self.io_worker, MQTT_HOST, MQTT_PORT, MQTT_QUEUE_FILE)
+        publisher.start()
+        self.mqtt_publisher = publisher
+
+    def _start_telemetry(self):
+        # Queued behind _start_mqtt on the I/O worker.
+        if self.mqtt_publisher is None:
+            return
+        telemetry = TelemetryBatcher(self.mqtt_publisher, self.io_worker, DEVICE_ID, TELEMETRY_ENCODING)
+        telemetry.start()
+        self.telemetry = telemetry
+
     def manual_decrement(self):
         if not self.check_debounce(): return 
         if self.pill_count > 0:
@@ -1926,32 +4326,6 @@ class PagtultolApp(App):
         empty_popup.open()
 
 
-    def on_start(self):
-        try:
-            self.arduino_serial = serial.Serial('/dev/ttyACM0', baudrate=9600, timeout=1)
-        except Exception:
-            self.arduino_serial = None
-            
-        Clock.schedule_interval(self.service_alarm_check, 1)
-
-    def service_alarm_check(self, dt):
-        now_time = datetime.now().strftime("%I:%M %p").strip().upper()
-        if not os.path.exists(ALARM_FILE): return
-
-        try:
-            with open(ALARM_FILE, "r") as f:
-                alarms = json.load(f)
-            if not alarms: return
-
-            for alarm in alarms:
-                target_time = alarm.get('time', "").strip().upper()
-                if target_time == now_time:
-                    if self.last_triggered_time != now_time:
-                        self.last_triggered_time = now_time
-                        self.trigger_medical_alert(target_time)
-                    break 
-        except Exception: pass
-
     def trigger_medical_alert(self, message="It is time for your scheduled medication."):
         try:
             GPIO.setmode(GPIO.BCM)
@@ -2018,17 +4392,8 @@ class PagtultolApp(App):
         print("Alarm automatically dismissed. WARNING sent to Arduino.")
 
     def send_warning_command(self):
-        if self.root and self.root.has_screen('vitals'):
-            vitals_screen = self.root.get_screen('vitals')
-            if hasattr(vitals_screen, 'ser') and vitals_screen.ser and vitals_screen.ser.is_open:
-                try:
-                    vitals_screen.ser.write(b"WARNING\n")
-                    return
-                except Exception: pass
-
-        if self.arduino_serial and self.arduino_serial.is_open:
-            try: self.arduino_serial.write(b"WARNING\n")
-            except Exception: pass
+        if self.serial_manager:
+            self.serial_manager.write(b"WARNING\n")
     
     def show_popup_and_loop(self, dt):
         try: GPIO.output(17, 0)
@@ -2043,37 +4408,57 @@ class PagtultolApp(App):
             GPIO.output(17, 1 if self.buzzer_state else 0)
         except Exception: pass
 
+    @property
+    def chat_history(self):
+        return self.chat_transcript.messages
+
     def save_chat_message(self, role, text):
-        message_data = {"role": role, "text": text, "timestamp": str(datetime.now())}
-        self.chat_history.append(message_data)
-        try:
-            with open(CHAT_FILE, "w") as f:
-                json.dump(self.chat_history, f, indent=4)
-        except: pass
+        self.chat_transcript.append(role, text)
 
     def clear_chat_data(self):
-        self.chat_history = []
-        try:
-            with open(CHAT_FILE, "w") as f:
-                json.dump([], f)
-        except: pass
+        self.chat_transcript.clear()
 
     def send_rotate_command(self):
-        if self.root and self.root.has_screen('vitals'):
-            vitals_screen = self.root.get_screen('vitals')
-            if hasattr(vitals_screen, 'ser') and vitals_screen.ser and vitals_screen.ser.is_open:
-                try:
-                    vitals_screen.ser.write(b"ROTATE\n")
-                    return
-                except Exception: pass
-
-        if self.arduino_serial and self.arduino_serial.is_open:
-            try: self.arduino_serial.write(b"ROTATE\n")
-            except Exception: pass
+        if self.serial_manager:
+            self.serial_manager.write(b"ROTATE\n")
 
     def on_stop(self):
-        if self.arduino_serial and self.arduino_serial.is_open:
-            self.arduino_serial.close()
+        if self.serial_manager:
+            self.serial_manager.stop()
+        if self.network_status:
+            self.network_status.stop()
+        if self.wifi_scanner:
+            self.wifi_scanner.stop()
+        if self.alarm_scheduler:
+            self.alarm_scheduler.stop()
+        if self.telemetry:
+            self.telemetry.stop()
+            print(f"Telemetry: batches={self.telemetry.batches} bytes={self.telemetry.bytes_sent} "
+                  f"encoding={self.telemetry.encoding}")
+        if self.mqtt_publisher:
+            self.mqtt_publisher.stop()
+            print(f"MQTT: sent={self.mqtt_publisher.sent} queued={self.mqtt_publisher.pending()} "
+                  f"dropped={self.mqtt_publisher.dropped}")
+        if self.io_worker:
+            if not self.io_worker.flush(IO_FLUSH_TIMEOUT):
+                print("IO worker did not drain before exit")
+            for store in (self.alarm_store, self.inventory_store):
+                store.flush()
+            for target, stats in self.io_worker.stats().items():
+                print(f"IO [{target}]: completed={stats['completed']} coalesced={stats['coalesced']} "
+                      f"wait avg={stats['avg_wait'] * 1000:.1f}ms max={stats['max_wait'] * 1000:.1f}ms")
+            self.io_worker.stop()
+        if self.wifi_backend:
+            self.wifi_backend.close()
+        if self.job_pool:
+            for job_class, stats in self.job_pool.stats().items():
+                print(f"Jobs [{job_class}]: queued={stats['queued']} completed={stats['completed']} "
+                      f"coalesced={stats['coalesced']} avg={stats['avg_time']:.2f}s max={stats['max_time']:.2f}s")
+            self.job_pool.shutdown()
+        if self.vitals_store:
+            self.vitals_store.close()
+        if self.llm_client:
+            self.llm_client.close()
 
     
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+"""HistoryScreen enter time at 100 / 1k / 10k stored records.
+
+Fills a throwaway vitals store, then runs the real Kivy event loop and
+times ``HistoryScreen.on_enter`` until the first page of rows has been
+laid out on screen. Reports the number of row widgets alive afterwards,
+which stays at what fits on screen regardless of store size. Absolute
+times depend heavily on the GL driver; compare sizes within one run.
+
+    python bench/history_enter.py --sizes 100 1000 10000 --backend both
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_LOG_MODE", "PYTHON")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import AI  # noqa: E402
+from kivy.app import App  # noqa: E402
+from kivy.clock import Clock  # noqa: E402
+from kivy.lang import Builder  # noqa: E402
+from kivy.uix.screenmanager import ScreenManager  # noqa: E402
+
+
+def make_store(backend, directory, size):
+    if backend == "sqlite":
+        store = AI.SqliteVitalsStore(os.path.join(directory, f"history_{size}.db"), legacy_path=None, jsonl_path=None)
+    else:
+        store = AI.VitalsStore(os.path.join(directory, f"vitals_{size}.jsonl"), legacy_path=None)
+    store.load()
+    start = time.time() - size * 60
+    for i in range(size):
+        sys_val, dia_val = 100 + i % 70, 60 + i % 40
+        store.append(sys_val, dia_val, 55 + i % 50, AI.classify_bp(sys_val, dia_val), timestamp=start + i * 60)
+    return store
+
+
+class HistoryBenchApp(App):
+    def __init__(self, cases, repeats, **kwargs):
+        super().__init__(**kwargs)
+        self.cases = list(cases)
+        self.repeats = repeats
+        self.results = []
+        self.io_worker = AI.IOWorker()
+        # The manager enters its first screen on build, before any timing.
+        self.vitals_store = self.cases[0][1]
+
+    def build(self):
+        Builder.load_file(os.path.join(ROOT, "new design.kv"))
+        self.manager = ScreenManager()
+        self.screen = AI.HistoryScreen(name="history")
+        self.manager.add_widget(self.screen)
+        return self.manager
+
+    def on_start(self):
+        Clock.schedule_once(self._next_case, 0.5)
+
+    def _next_case(self, dt):
+        if not self.cases:
+            self.stop()
+            return
+        self.label, self.vitals_store = self.cases.pop(0)
+        self.samples = []
+        self._enter()
+
+    def _enter(self):
+        self._frames = 0
+        self._started = time.perf_counter()
+        self.screen.on_enter()
+        Clock.schedule_once(self._check_rendered, 0)
+
+    def _check_rendered(self, dt):
+        layout = self.screen.ids.history_rv.layout_manager
+        self._frames += 1
+        if self.screen._loading or not layout.children:
+            Clock.schedule_once(self._check_rendered, 0)
+            return
+        self.samples.append((time.perf_counter() - self._started, self._frames))
+        if len(self.samples) < self.repeats:
+            Clock.schedule_once(lambda dt: self._enter(), 0.1)
+            return
+        self.results.append((self.label, self.samples, len(layout.children)))
+        self.vitals_store.close()
+        Clock.schedule_once(self._next_case, 0.1)
+
+    def on_stop(self):
+        self.io_worker.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--backend", choices=["jsonl", "sqlite", "both"], default="both")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    backends = ["jsonl", "sqlite"] if args.backend == "both" else [args.backend]
+    with tempfile.TemporaryDirectory() as directory:
+        cases = []
+        for backend in backends:
+            for size in args.sizes:
+                cases.append((f"{backend} {size}", make_store(backend, directory, size)))
+        app = HistoryBenchApp(cases, args.repeats)
+        app.run()
+
+    for label, samples, rows in app.results:
+        ms = [elapsed * 1000 for elapsed, frames in samples]
+        frames = statistics.median(frames for elapsed, frames in samples)
+        print(f"{label:<14} enter median={statistics.median(ms):7.2f} ms  max={max(ms):7.2f} ms  "
+              f"frames={frames:g}  row widgets={rows}")
+
+
+if __name__ == "__main__":
+    main()
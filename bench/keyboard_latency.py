@@ -0,0 +1,122 @@
+"""On-screen keyboard keypress-to-render latency.
+
+Runs the real Kivy loop with an OnScreenKeyboard bound to a TextInput and
+replays a typing script that mixes letters, SHIFT, CAPS and page
+switches. Each sample runs from the key press until the next frame has
+been drawn. The legacy mode rebuilds every key on SHIFT, CAPS, MORE,
+MAIN and after a shifted letter, as the screens did before the shared
+keyboard.
+
+    python bench/keyboard_latency.py --repeats 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_LOG_MODE", "PYTHON")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AI  # noqa: E402
+from kivy.app import App  # noqa: E402
+from kivy.clock import Clock  # noqa: E402
+from kivy.uix.boxlayout import BoxLayout  # noqa: E402
+from kivy.uix.textinput import TextInput  # noqa: E402
+
+SCRIPT = ["SHIFT", "h", "e", "l", "l", "o", "SPACE", "CAPS", "w", "i", "f", "i", "CAPS",
+          "MORE", "1", "2", "3", "MAIN", "SHIFT", "p", "a", "s", "s", "BACK", "s"]
+MODE_KEYS = ("SHIFT", "CAPS", "MORE", "MAIN")
+
+
+class LegacyKeyboard(AI.OnScreenKeyboard):
+    def _rebuild(self):
+        self._pages.clear()
+        self._shown_page = None
+        self.show()
+
+    def press(self, key, btn, *args):
+        shifted = self.shift_enabled and not self.caps_enabled and len(key) == 1 and key.isalpha()
+        super().press(key, btn, *args)
+        if key in MODE_KEYS or shifted:
+            self._rebuild()
+
+
+class KeyboardBenchApp(App):
+    def __init__(self, modes, repeats, **kwargs):
+        super().__init__(**kwargs)
+        self.modes = list(modes)
+        self.repeats = repeats
+        self.results = []
+
+    def build(self):
+        root = BoxLayout(orientation="vertical")
+        self.text_input = TextInput(size_hint_y=0.3)
+        self.container = BoxLayout(orientation="vertical")
+        root.add_widget(self.text_input)
+        root.add_widget(self.container)
+        return root
+
+    def on_start(self):
+        Clock.schedule_once(self._next_mode, 0.5)
+
+    def _next_mode(self, dt):
+        if not self.modes:
+            self.stop()
+            return
+        self.mode = self.modes.pop(0)
+        cls = LegacyKeyboard if self.mode == "legacy" else AI.OnScreenKeyboard
+        self.keyboard = cls(self.container, lambda: self.text_input)
+        self.keyboard.reset()
+        self.text_input.text = ""
+        self.queue = SCRIPT * self.repeats
+        self.samples = {"letter": [], "mode": []}
+        Clock.schedule_once(self._press, 0.2)
+
+    def _find_button(self, key):
+        for name, btn in self.keyboard._pages[self.keyboard.page][1]:
+            if name == key:
+                return btn
+        raise KeyError(key)
+
+    def _press(self, dt):
+        if not self.queue:
+            self.results.append((self.mode, self.samples, self.keyboard.pages_built, self.text_input.text))
+            Clock.schedule_once(self._next_mode, 0.2)
+            return
+        key = self.queue.pop(0)
+        self._kind = "mode" if key in MODE_KEYS else "letter"
+        btn = self._find_button(key)
+        self._started = time.perf_counter()
+        self.keyboard.press(key, btn)
+        # Runs after this frame's draw, so the sample covers the redraw.
+        Clock.schedule_once(self._rendered, 0)
+
+    def _rendered(self, dt):
+        self.samples[self._kind].append(time.perf_counter() - self._started)
+        Clock.schedule_once(self._press, 0.03)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5, help="times to replay the typing script")
+    parser.add_argument("--mode", choices=["shared", "legacy", "both"], default="both")
+    args = parser.parse_args()
+
+    modes = ["shared", "legacy"] if args.mode == "both" else [args.mode]
+    app = KeyboardBenchApp(modes, args.repeats)
+    app.run()
+
+    for mode, samples, pages_built, text in app.results:
+        for kind, values in samples.items():
+            ms = sorted(v * 1000 for v in values)
+            p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+            print(f"{mode:<7} {kind:<6} presses={len(ms):4d}  median={statistics.median(ms):7.2f} ms  "
+                  f"p95={p95:7.2f} ms  max={ms[-1]:7.2f} ms")
+        print(f"{mode:<7} pages built={pages_built}  typed={text[:24]!r}")
+
+
+if __name__ == "__main__":
+    main()
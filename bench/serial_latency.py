@@ -0,0 +1,115 @@
+"""Serial frame latency against a pty standing in for /dev/ttyACM0.
+
+Writes ``SYS=DIA=BPM`` lines to the master end of a pty and measures the
+time until SerialManager hands each frame to its subscriber. The legacy
+``in_waiting`` + ``sleep(0.1)`` loop is measured the same way for
+comparison.
+
+    python bench/serial_latency.py --frames 200
+"""
+import argparse
+import os
+import pty
+import random
+import statistics
+import sys
+import threading
+import time
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_LOG_MODE", "PYTHON")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serial  # noqa: E402
+
+import AI  # noqa: E402
+
+
+def open_pty():
+    master, slave = pty.openpty()
+    os.set_blocking(master, True)
+    return master, os.ttyname(slave), slave
+
+
+def drive(master, frames, gap, received, sent):
+    for i in range(frames):
+        sent.append(time.perf_counter())
+        os.write(master, f"{110 + i % 40}={70 + i % 20}={60 + i % 30}\n".encode())
+        deadline = time.monotonic() + 2
+        while len(received) <= i and time.monotonic() < deadline:
+            time.sleep(0.0005)
+        # Jitter keeps frames from phase-locking with a polling loop.
+        time.sleep(gap + random.uniform(0, 0.1))
+
+
+def bench_serial_manager(frames, gap):
+    master, name, slave = open_pty()
+    pool = AI.JobPool({"serial": 2})
+    manager = AI.SerialManager(pool, port=name, baudrate=AI.SERIAL_BAUDRATE)
+    received = []
+    manager.subscribe(lambda *frame: received.append(time.perf_counter()))
+    manager.start()
+    sent = []
+    try:
+        drive(master, frames, gap, received, sent)
+    finally:
+        manager.stop()
+        pool.shutdown()
+        os.close(master)
+        os.close(slave)
+    return [r - s for s, r in zip(sent, received)]
+
+
+def bench_legacy_polling(frames, gap):
+    master, name, slave = open_pty()
+    ser = serial.Serial(name, AI.SERIAL_BAUDRATE, timeout=1)
+    received = []
+    stop = threading.Event()
+
+    def poll():
+        while not stop.is_set():
+            if ser.in_waiting > 0:
+                line = ser.readline().decode("utf-8", errors="ignore").strip()
+                if len(line.split("=")) == 3:
+                    received.append(time.perf_counter())
+            time.sleep(0.1)
+
+    thread = threading.Thread(target=poll, daemon=True)
+    thread.start()
+    sent = []
+    try:
+        drive(master, frames, gap, received, sent)
+    finally:
+        stop.set()
+        thread.join()
+        ser.close()
+        os.close(master)
+        os.close(slave)
+    return [r - s for s, r in zip(sent, received)]
+
+
+def report(label, latencies, frames):
+    ms = sorted(x * 1000 for x in latencies)
+    if not ms:
+        print(f"{label:<16} no frames received")
+        return
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    print(f"{label:<16} frames={len(ms)}/{frames}  median={statistics.median(ms):7.2f} ms  "
+          f"p95={p95:7.2f} ms  max={ms[-1]:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--gap", type=float, default=0.03, help="seconds between frames")
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    report("SerialManager", bench_serial_manager(args.frames, args.gap), args.frames)
+    if not args.skip_legacy:
+        report("legacy polling", bench_legacy_polling(args.frames, args.gap), args.frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""UI frame time while a synthetic 2,000-token answer streams into chat.
+
+Runs the real Kivy loop with a ChatScreen and feeds tokens from a worker
+thread at a fixed rate, either through StreamBuffer (one label update
+per frame) or the legacy way (one Clock callback and label update per
+token). Reports frame-time percentiles, the number of label updates and
+the main-thread time spent applying them.
+
+    python bench/stream_frames.py --tokens 2000 --rate 400
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from functools import partial
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_LOG_MODE", "PYTHON")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import AI  # noqa: E402
+from kivy.app import App  # noqa: E402
+from kivy.clock import Clock  # noqa: E402
+from kivy.lang import Builder  # noqa: E402
+
+WORDS = ("blood pressure reading heart rate normal range doctor rest measure again "
+         "systolic diastolic healthy habits salt water sleep exercise monitor").split()
+
+
+def synthetic_tokens(count, seed=7):
+    rng = random.Random(seed)
+    tokens = []
+    for i in range(count):
+        token = " " + rng.choice(WORDS)
+        if i % 40 == 39:
+            token += ".\n\n"
+        tokens.append(token)
+    return tokens
+
+
+class StreamBenchApp(App):
+    def __init__(self, modes, tokens, rate, **kwargs):
+        super().__init__(**kwargs)
+        self.modes = list(modes)
+        self.tokens = tokens
+        self.rate = rate
+        self.results = []
+        self.chat_history = []
+
+    def save_chat_message(self, role, text):
+        self.chat_history.append({"role": role, "text": text})
+
+    def build(self):
+        Builder.load_file(os.path.join(ROOT, "new design.kv"))
+        # Used as the root widget so on_enter (network status, keyboard)
+        # never runs; only the message list is exercised.
+        self.screen = AI.ChatScreen(name="chat")
+        return self.screen
+
+    def on_start(self):
+        Clock.schedule_once(self._next_mode, 0.5)
+
+    def _next_mode(self, dt):
+        if not self.modes:
+            self.stop()
+            return
+        self.mode = self.modes.pop(0)
+        screen = self.screen
+        screen.ids.messages_layout.clear_widgets()
+        screen.current_ai_text_accumulator = ""
+        screen.is_thinking = False
+        screen.assistant_bubble, screen.assistant_label = screen.add_assistant_placeholder()
+        screen.assistant_label.text = ""
+
+        self.frames = []
+        self.updates = 0
+        self.work = 0.0
+        self.done = threading.Event()
+        self._last_frame = time.perf_counter()
+        Clock.schedule_interval(self._on_frame, 0)
+        self._started = time.perf_counter()
+        threading.Thread(target=self._produce, daemon=True).start()
+
+    def _on_frame(self, dt):
+        now = time.perf_counter()
+        self.frames.append(now - self._last_frame)
+        self._last_frame = now
+        if not self.done.is_set():
+            return True
+        elapsed = now - self._started
+        self.results.append((self.mode, self.frames, self.updates, self.work, elapsed))
+        Clock.schedule_once(self._next_mode, 0.5)
+        return False
+
+    def _buffered_flush(self, text, is_done):
+        started = time.perf_counter()
+        self.updates += 1
+        self.screen._process_stream_chunk(text, is_done)
+        self.work += time.perf_counter() - started
+        if is_done:
+            self.done.set()
+
+    def _legacy_chunk(self, token, is_done, dt):
+        # What ChatScreen did before StreamBuffer: one label update and one
+        # scroll callback per token.
+        started = time.perf_counter()
+        self.updates += 1
+        screen = self.screen
+        if is_done:
+            self.done.set()
+            return
+        screen.assistant_label.text += token
+        screen.current_ai_text_accumulator += token
+        Clock.schedule_once(lambda dt: screen.scroll_to_bottom(), 0)
+        self.work += time.perf_counter() - started
+
+    def _produce(self):
+        gap = 1.0 / self.rate
+        if self.mode == "buffered":
+            stream = AI.StreamBuffer(self._buffered_flush, AI.STREAM_FLUSH_INTERVAL)
+            for token in self.tokens:
+                stream.push(token)
+                time.sleep(gap)
+            stream.finish()
+        else:
+            for token in self.tokens:
+                Clock.schedule_once(partial(self._legacy_chunk, token, False), 0)
+                time.sleep(gap)
+            Clock.schedule_once(partial(self._legacy_chunk, "", True), 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=400, help="tokens per second")
+    parser.add_argument("--mode", choices=["buffered", "legacy", "both"], default="both")
+    args = parser.parse_args()
+
+    modes = ["buffered", "legacy"] if args.mode == "both" else [args.mode]
+    app = StreamBenchApp(modes, synthetic_tokens(args.tokens), args.rate)
+    app.run()
+
+    for mode, frames, updates, work, elapsed in app.results:
+        ms = sorted(f * 1000 for f in frames)
+        p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+        print(f"{mode:<9} frames={len(ms):5d}  median={statistics.median(ms):6.2f} ms  p95={p95:7.2f} ms  "
+              f"max={ms[-1]:7.2f} ms  label updates={updates}  update work={work * 1000:7.1f} ms  "
+              f"stream={elapsed:5.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Wi-Fi list tap-to-render latency with 50 networks.
+
+Runs the real Kivy loop with a WifiScreen showing synthetic scan results
+and times toggle_expand on the connected network until the next frame
+has been drawn. Also reports how many row widgets each tap and each
+rescan (with a few percent of signal jitter) rebuilt.
+
+    python bench/wifi_expand.py --networks 50 --taps 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_LOG_MODE", "PYTHON")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import AI  # noqa: E402
+from kivy.app import App  # noqa: E402
+from kivy.clock import Clock  # noqa: E402
+from kivy.lang import Builder  # noqa: E402
+
+
+def synthetic_networks(count, seed=3):
+    rng = random.Random(seed)
+    networks = []
+    for i in range(count):
+        networks.append({
+            'ssid': f"Network-{i:02d}",
+            'active': i == 0,
+            'signal': rng.randint(5, 99),
+            'security': rng.choice(["WPA2", "WPA3", "WPA1", ""]),
+            'bssid': ":".join(f"{rng.randint(0, 255):02X}" for _ in range(6)),
+        })
+    networks.sort(key=lambda x: (not x['active'], -x['signal'], x['ssid']))
+    return networks
+
+
+def jitter(networks, rng, spread=3):
+    return [dict(net, signal=max(1, min(100, net['signal'] + rng.randint(-spread, spread)))) for net in networks]
+
+
+class WifiBenchApp(App):
+    def __init__(self, networks, taps, rescans, **kwargs):
+        super().__init__(**kwargs)
+        self.networks = networks
+        self.taps = taps
+        self.rescans = rescans
+        self.wifi_scanner = AI.WifiScanService(None, None)
+        self.tap_samples = []
+        self.tap_rebuilt = []
+        self.rescan_rebuilt = []
+        self.rng = random.Random(11)
+
+    def build(self):
+        Builder.load_file(os.path.join(ROOT, "new design.kv"))
+        # Used as the root widget so on_enter (scanner, radio) never runs.
+        self.screen = AI.WifiScreen(name="wifi")
+        return self.screen
+
+    def on_start(self):
+        Clock.schedule_once(self._first_render, 0.5)
+
+    def _rows(self):
+        return set(id(w) for w in self.screen.ids.wifi_list_layout.children)
+
+    def _first_render(self, dt):
+        screen = self.screen
+        screen.ids.wifi_switch.active = True
+        started = time.perf_counter()
+        screen.cached_networks = self.networks
+        screen._render_network_list()
+        self.first_render = (time.perf_counter() - started, len(screen.ids.wifi_list_layout.children))
+        Clock.schedule_once(self._tap, 0.2)
+
+    def _tap(self, dt):
+        if len(self.tap_samples) >= self.taps:
+            Clock.schedule_once(self._rescan, 0.2)
+            return
+        before = self._rows()
+        self._started = time.perf_counter()
+        self.screen.toggle_expand(self.networks[0]['ssid'])
+        self.tap_rebuilt.append(len(self._rows() - before))
+        # Runs after this frame's draw, so the sample covers the redraw.
+        Clock.schedule_once(self._tap_rendered, 0)
+
+    def _tap_rendered(self, dt):
+        self.tap_samples.append(time.perf_counter() - self._started)
+        Clock.schedule_once(self._tap, 0.05)
+
+    def _rescan(self, dt):
+        if len(self.rescan_rebuilt) >= self.rescans:
+            self.stop()
+            return
+        before = self._rows()
+        self.networks = jitter(self.networks, self.rng)
+        self.screen._on_scan_results(self.networks, time.time())
+        self.rescan_rebuilt.append(len(self._rows() - before))
+        Clock.schedule_once(self._rescan, 0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--networks", type=int, default=50)
+    parser.add_argument("--taps", type=int, default=20)
+    parser.add_argument("--rescans", type=int, default=10)
+    args = parser.parse_args()
+
+    app = WifiBenchApp(synthetic_networks(args.networks), args.taps, args.rescans)
+    app.run()
+
+    elapsed, rows = app.first_render
+    ms = sorted(s * 1000 for s in app.tap_samples)
+    print(f"first render   {elapsed * 1000:7.2f} ms  rows={rows}")
+    print(f"tap to render  median={statistics.median(ms):7.2f} ms  max={ms[-1]:7.2f} ms  "
+          f"rows rebuilt per tap={statistics.median(app.tap_rebuilt):g}")
+    print(f"rescan         rows rebuilt per scan median={statistics.median(app.rescan_rebuilt):g}  "
+          f"max={max(app.rescan_rebuilt)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+def test_readings_in_a_bucket_share_key_and_prompt(ai):
+    assert ai.bp_cache_key(121, 79, 72) == ai.bp_cache_key(119, 81, 68)
+    assert ai.bp_cache_prompt(121, 79, 72) == ai.bp_cache_prompt(119, 81, 68)
+
+
+def test_cache_prompt_carries_no_exact_numbers(ai):
+    prompt = ai.bp_cache_prompt(121, 79, 72)
+    assert "121" not in prompt and "79" not in prompt and "72" not in prompt
+    assert "120/80" in prompt
+
+
+def test_rules_explain_the_exact_reading_behind_a_cache_prompt(ai):
+    history = [{"role": "user", "text": ai.bp_cache_prompt(139, 89, 72),
+                "reading_text": "I just measured 139/89 mmHg with a heart rate of 72 bpm."}]
+    text = ai.RuleBasedResponder().explain(history, [])
+    assert "139/89" in text
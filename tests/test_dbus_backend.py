@@ -0,0 +1,300 @@
+import shutil
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+pytest.importorskip("dbus")
+pytest.importorskip("gi")
+
+# A stand-in NetworkManager exposing only what DbusWifiBackend touches: one
+# Wi-Fi device that stays ACTIVATED on its current network, a few access
+# points, saved profiles and active connections. Method calls are appended
+# to a log file the tests read back.
+STAND_IN = textwrap.dedent('''
+    import sys
+    import time
+    import dbus
+    import dbus.service
+    from dbus.mainloop.glib import DBusGMainLoop
+    from gi.repository import GLib
+
+    NM = "org.freedesktop.NetworkManager"
+    PROPS = "org.freedesktop.DBus.Properties"
+    ROOT = "/org/freedesktop/NetworkManager"
+    LOG = sys.argv[1]
+
+    def record(*parts):
+        with open(LOG, "a") as f:
+            f.write(" ".join(str(p) for p in parts) + "\\n")
+
+    class Obj(dbus.service.Object):
+        def __init__(self, bus, path, props):
+            super().__init__(bus, path)
+            self.path = path
+            self.props = props
+
+        @dbus.service.method(PROPS, in_signature="s", out_signature="a{sv}")
+        def GetAll(self, interface):
+            return self.props.get(interface, {})
+
+        @dbus.service.method(PROPS, in_signature="ssv")
+        def Set(self, interface, name, value):
+            record("set", name, bool(value))
+            self.props.setdefault(interface, {})[name] = value
+
+    def ap_props(ssid, strength, bssid, rsn=0, wpa=0, flags=0):
+        return {NM + ".AccessPoint": {
+            "Ssid": dbus.ByteArray(ssid.encode()), "Strength": dbus.Byte(strength),
+            "HwAddress": bssid, "RsnFlags": dbus.UInt32(rsn), "WpaFlags": dbus.UInt32(wpa),
+            "Flags": dbus.UInt32(flags),
+        }}
+
+    class Device(Obj):
+        @dbus.service.method(NM + ".Device")
+        def Disconnect(self):
+            record("device-disconnect")
+
+        @dbus.service.method(NM + ".Device.Wireless", out_signature="ao")
+        def GetAllAccessPoints(self):
+            return [dbus.ObjectPath(p) for p in access_points]
+
+        @dbus.service.method(NM + ".Device.Wireless", in_signature="a{sv}")
+        def RequestScan(self, options):
+            record("request-scan")
+            GLib.timeout_add(300, self._scan_done)
+
+        def _scan_done(self):
+            path = ROOT + "/AccessPoint/4"
+            access_points.append(path)
+            Obj(bus, path, ap_props("CafeNet", 55, "AA:00:00:00:00:04", rsn=0x400))
+            self.props[NM + ".Device.Wireless"]["LastScan"] = dbus.Int64(int(time.monotonic() * 1000))
+            self.AccessPointAdded(dbus.ObjectPath(path))
+            return False
+
+        @dbus.service.signal(NM + ".Device.Wireless", signature="o")
+        def AccessPointAdded(self, path):
+            pass
+
+        @dbus.service.signal(NM + ".Device", signature="uuu")
+        def StateChanged(self, new_state, old_state, reason):
+            pass
+
+    class SettingsConnection(dbus.service.Object):
+        def __init__(self, bus, path, settings):
+            super().__init__(bus, path)
+            self.path = path
+            self.settings = settings
+
+        @dbus.service.method(NM + ".Settings.Connection", out_signature="a{sa{sv}}")
+        def GetSettings(self):
+            return self.settings
+
+        @dbus.service.method(NM + ".Settings.Connection")
+        def Delete(self):
+            record("delete", self.settings["connection"]["id"])
+            del connections[self.path]
+            self.remove_from_connection()
+
+    class Settings(dbus.service.Object):
+        @dbus.service.method(NM + ".Settings", out_signature="ao")
+        def ListConnections(self):
+            return [dbus.ObjectPath(p) for p in connections]
+
+    counter = [10]
+
+    def add_connection(settings):
+        counter[0] += 1
+        path = ROOT + "/Settings/%d" % counter[0]
+        connections[path] = SettingsConnection(bus, path, settings)
+        return path
+
+    def activate(settings):
+        # Activation takes a moment; the device keeps reporting the old
+        # network as ACTIVATED meanwhile. A "wrong" PSK ends DEACTIVATED and
+        # the "Vanishing" profile fails by removing its active connection.
+        counter[0] += 1
+        path = ROOT + "/ActiveConnection/%d" % counter[0]
+        conn_id = str(settings["connection"]["id"])
+        active = Obj(bus, path, {NM + ".Connection.Active": {"Id": conn_id, "State": dbus.UInt32(1)}})
+
+        def finish():
+            psk = settings.get("802-11-wireless-security", {}).get("psk", "")
+            if conn_id == "Vanishing":
+                active.remove_from_connection()
+            else:
+                state = 4 if psk == "wrong" or conn_id == "Broken" else 2
+                active.props[NM + ".Connection.Active"]["State"] = dbus.UInt32(state)
+            device.StateChanged(dbus.UInt32(100), dbus.UInt32(100), dbus.UInt32(0))
+            return False
+        GLib.timeout_add(400, finish)
+        return dbus.ObjectPath(path)
+
+    class Manager(Obj):
+        @dbus.service.method(NM, out_signature="ao")
+        def GetDevices(self):
+            return [dbus.ObjectPath(DEVICE)]
+
+        @dbus.service.method(NM, in_signature="o")
+        def DeactivateConnection(self, path):
+            record("deactivate", path)
+
+        @dbus.service.method(NM, in_signature="ooo", out_signature="o")
+        def ActivateConnection(self, connection, device_path, specific):
+            settings = connections[str(connection)].settings
+            record("activate", settings["connection"]["id"])
+            return activate(settings)
+
+        @dbus.service.method(NM, in_signature="a{sa{sv}}oo", out_signature="oo")
+        def AddAndActivateConnection(self, settings, device_path, specific):
+            record("add-and-activate", settings["connection"]["id"])
+            return dbus.ObjectPath(add_connection(settings)), activate(settings)
+
+    DEVICE = ROOT + "/Devices/1"
+    ACTIVE = ROOT + "/ActiveConnection/"
+
+    DBusGMainLoop(set_as_default=True)
+    bus = dbus.bus.BusConnection(sys.argv[2])
+    name = dbus.service.BusName(NM, bus)
+
+    access_points = [ROOT + "/AccessPoint/%d" % i for i in (1, 2, 3)]
+    Obj(bus, access_points[0], ap_props("HomeNet", 40, "AA:00:00:00:00:01", rsn=0x100))
+    Obj(bus, access_points[1], ap_props("HomeNet", 70, "AA:00:00:00:00:02", rsn=0x100))
+    Obj(bus, access_points[2], ap_props("OpenNet", 30, "AA:00:00:00:00:03"))
+
+    Manager(bus, ROOT, {NM: {
+        "ActiveConnections": dbus.Array([dbus.ObjectPath(ACTIVE + "1"), dbus.ObjectPath(ACTIVE + "2")], signature="o"),
+        "WirelessEnabled": True,
+    }})
+    device = Device(bus, DEVICE, {
+        NM + ".Device": {"DeviceType": dbus.UInt32(2), "Interface": "wlan0", "State": dbus.UInt32(100)},
+        NM + ".Device.Wireless": {
+            "ActiveAccessPoint": dbus.ObjectPath(access_points[0]),
+            "LastScan": dbus.Int64(1),
+        },
+    })
+    Obj(bus, ACTIVE + "1", {NM + ".Connection.Active": {"Id": "Wired", "State": dbus.UInt32(2)}})
+    Obj(bus, ACTIVE + "2", {NM + ".Connection.Active": {"Id": "HomeNet", "State": dbus.UInt32(2)}})
+
+    Settings(bus, ROOT + "/Settings")
+    connections = {}
+    for profile in ("HomeNet", "Broken", "Vanishing"):
+        add_connection({
+            "connection": {"id": profile, "type": "802-11-wireless"},
+            "802-11-wireless": {"ssid": dbus.ByteArray(profile.encode())},
+        })
+    record("ready")
+    GLib.MainLoop().run()
+''')
+
+
+@pytest.fixture
+def stand_in_nm(tmp_path):
+    if shutil.which("dbus-daemon") is None:
+        pytest.skip("dbus-daemon not available")
+    daemon = subprocess.Popen(
+        ["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+        stdout=subprocess.PIPE, text=True,
+    )
+    address = daemon.stdout.readline().strip()
+    log = tmp_path / "calls.log"
+    script = tmp_path / "stand_in_nm.py"
+    script.write_text(STAND_IN)
+    service = subprocess.Popen([sys.executable, str(script), str(log), address])
+    deadline = time.monotonic() + 10
+    while not (log.exists() and "ready" in log.read_text()):
+        if time.monotonic() > deadline or service.poll() is not None:
+            pytest.fail("stand-in NetworkManager did not start")
+        time.sleep(0.05)
+    try:
+        yield address, log
+    finally:
+        service.terminate()
+        daemon.terminate()
+        service.wait()
+        daemon.wait()
+
+
+@pytest.fixture
+def backend(ai, stand_in_nm):
+    address, log = stand_in_nm
+    backend = ai.DbusWifiBackend(bus_address=address, interface="wlan0")
+    backend.log = log
+    yield backend
+    backend.close()
+
+
+def _calls(backend):
+    return backend.log.read_text().splitlines()
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_scan_without_rescan_reads_cached_access_points(backend):
+    networks = {net['ssid']: net for net in backend.scan(rescan=False)}
+
+    assert sorted(networks) == ["HomeNet", "OpenNet"]
+    # The active BSSID wins over a stronger one with the same SSID.
+    assert networks["HomeNet"] == {
+        'ssid': "HomeNet", 'active': True, 'signal': 40, 'security': "WPA2", 'bssid': "AA:00:00:00:00:01",
+    }
+    assert networks["OpenNet"]['security'] == ""
+    assert "request-scan" not in _calls(backend)
+
+
+def test_rescan_waits_for_last_scan_and_notifies_listeners(backend):
+    events = []
+    backend.add_listener(events.append)
+
+    networks = {net['ssid']: net for net in backend.scan(rescan=True)}
+
+    assert "request-scan" in _calls(backend)
+    assert networks["CafeNet"]['security'] == "WPA3"
+    assert _wait_for(lambda: "scan" in events)
+
+
+def test_connect_waits_for_the_new_active_connection(backend):
+    events = []
+    backend.add_listener(events.append)
+
+    assert backend.connect("CafeNet", "secret") is True
+    assert "add-and-activate CafeNet" in _calls(backend)
+    assert _wait_for(lambda: "state" in events)
+
+
+def test_connect_with_a_wrong_password_fails_while_device_stays_activated(backend):
+    assert backend.connect("HomeNet", "wrong") is False
+    calls = _calls(backend)
+    # The old profile is replaced rather than duplicated.
+    assert calls.index("delete HomeNet") < calls.index("add-and-activate HomeNet")
+
+
+def test_connect_saved_reports_the_real_result(backend):
+    assert backend.connect_saved("HomeNet") is True
+    assert backend.connect_saved("Broken") is False
+    assert backend.connect_saved("Vanishing") is False
+    assert backend.connect_saved("Unknown") is False
+
+
+def test_saved_profiles_and_radio(backend):
+    assert backend.saved_profiles() == ["HomeNet", "Broken", "Vanishing"]
+    backend.set_radio(False)
+    assert "set WirelessEnabled False" in _calls(backend)
+
+
+def test_disconnect_deactivates_only_the_matching_connection(backend):
+    assert backend.disconnect("HomeNet") is True
+    assert backend.disconnect("Elsewhere") is False
+
+    calls = _calls(backend)
+    assert any(line.startswith("deactivate") and line.endswith("/ActiveConnection/2") for line in calls)
+    assert "device-disconnect" not in calls
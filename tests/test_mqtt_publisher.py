@@ -0,0 +1,179 @@
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("paho.mqtt.client")
+
+
+def _read_exact(conn, n):
+    data = b""
+    while len(data) < n:
+        chunk = conn.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("closed")
+        data += chunk
+    return data
+
+
+def _read_packet(conn):
+    header = _read_exact(conn, 1)[0]
+    length, shift = 0, 0
+    while True:
+        byte = _read_exact(conn, 1)[0]
+        length |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            break
+    return header, _read_exact(conn, length)
+
+
+class StandInBroker:
+    """Just enough MQTT 3.1.1 to accept QoS 1 publishes from paho."""
+
+    def __init__(self, port=0, ack=True):
+        self.ack = ack
+        self.connections = []
+        self._sock = socket.socket()
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", port))
+        self._sock.listen(5)
+        self.port = self._sock.getsockname()[1]
+        self._stopped = False
+        self._conns = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while not self._stopped:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self._conns.append(conn)
+            received = []
+            self.connections.append(received)
+            threading.Thread(target=self._serve, args=(conn, received), daemon=True).start()
+
+    def _serve(self, conn, received):
+        try:
+            while True:
+                header, body = _read_packet(conn)
+                kind = header >> 4
+                if kind == 1:
+                    conn.sendall(b"\x20\x02\x00\x00")
+                elif kind == 3:
+                    topic_len = struct.unpack("!H", body[:2])[0]
+                    topic = body[2:2 + topic_len].decode()
+                    mid = struct.unpack("!H", body[2 + topic_len:4 + topic_len])[0]
+                    received.append((topic, body[4 + topic_len:]))
+                    if self.ack:
+                        conn.sendall(b"\x40\x02" + struct.pack("!H", mid))
+                elif kind == 12:
+                    conn.sendall(b"\xd0\x00")
+                elif kind == 14:
+                    return
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def drop_clients(self):
+        for conn in self._conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def close(self):
+        self._stopped = True
+        self.drop_clients()
+        self._sock.close()
+
+
+def _wait_for(ai, condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        ai.Clock.tick()
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_queues_while_broker_down_then_replays_in_order(ai, tmp_path):
+    port = _free_port()
+    publisher = ai.MqttPublisher(None, "127.0.0.1", port, str(tmp_path / "queue.json"))
+    publisher.start()
+    try:
+        for i in range(3):
+            publisher.publish("vitals/data", f"m{i}")
+        assert publisher.pending() == 3
+
+        broker = StandInBroker(port)
+        try:
+            assert _wait_for(ai, lambda: publisher.pending() == 0)
+            sent = [payload for conn in broker.connections for _, payload in conn]
+            assert sent == [b"m0", b"m1", b"m2"]
+        finally:
+            broker.close()
+    finally:
+        publisher.stop()
+
+
+def test_unacked_messages_are_not_sent_twice_per_connection(ai, tmp_path):
+    broker = StandInBroker(ack=False)
+    publisher = ai.MqttPublisher(None, "127.0.0.1", broker.port, str(tmp_path / "queue.json"))
+    publisher.start()
+    try:
+        assert _wait_for(ai, lambda: publisher.connected)
+        publisher.publish("vitals/data", "a")
+        publisher.publish("vitals/data", "b")
+        assert _wait_for(ai, lambda: len(broker.connections[0]) == 2)
+
+        broker.ack = True
+        broker.drop_clients()
+        assert _wait_for(ai, lambda: publisher.pending() == 0)
+        replayed = [payload for _, payload in broker.connections[-1]]
+        assert sorted(replayed) == [b"a", b"b"]
+    finally:
+        publisher.stop()
+        broker.close()
+
+
+def test_queue_survives_restart(ai, tmp_path):
+    queue_path = str(tmp_path / "queue.json")
+    publisher = ai.MqttPublisher(None, "127.0.0.1", _free_port(), queue_path)
+    publisher.start()
+    publisher.publish("telemetry/x/gzip", b"\x1f\x8b binary")
+    publisher.stop()
+
+    broker = StandInBroker()
+    restarted = ai.MqttPublisher(None, "127.0.0.1", broker.port, queue_path)
+    restarted.start()
+    try:
+        assert restarted.pending() == 1
+        assert _wait_for(ai, lambda: restarted.pending() == 0)
+        assert broker.connections[0] == [("telemetry/x/gzip", b"\x1f\x8b binary")]
+    finally:
+        restarted.stop()
+        broker.close()
+
+
+def test_bounded_queue_drops_oldest(ai, tmp_path):
+    publisher = ai.MqttPublisher(None, "127.0.0.1", _free_port(), str(tmp_path / "queue.json"), max_queued=2)
+    publisher.start()
+    try:
+        for i in range(4):
+            publisher.publish("vitals/data", f"m{i}")
+        assert publisher.pending() == 2
+        assert publisher.dropped == 2
+    finally:
+        publisher.stop()
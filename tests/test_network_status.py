@@ -0,0 +1,63 @@
+import os
+import stat
+
+import pytest
+
+
+class RecordingPool:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, job_class, fn, *args, key=None, **kwargs):
+        self.submitted.append((job_class, key))
+        fn(*args, **kwargs)
+        return True
+
+
+@pytest.fixture
+def fake_nmcli(tmp_path, monkeypatch):
+    calls = tmp_path / "calls.log"
+    script = tmp_path / "nmcli"
+    script.write_text(
+        "#!/bin/sh\n"
+        f'echo "$@" >> "{calls}"\n'
+        'echo "lo:loopback:unmanaged"\n'
+        'echo "wlan0:wifi:connected"\n'
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return calls
+
+
+def test_check_uses_a_single_nmcli_call(ai, fake_nmcli, monkeypatch):
+    monkeypatch.setattr(ai, "WIRELESS_PROC_FILE", "/nonexistent")
+    service = ai.NetworkStatusService(RecordingPool(), None, interval=5, nmcli_cmd=["nmcli"])
+    service._check()
+
+    assert service.is_connected is True
+    assert service.signal_level == 75
+    assert service.forks == 1
+    assert fake_nmcli.read_text().splitlines() == ["-t -f DEVICE,TYPE,STATE dev"]
+
+
+def test_subscribers_are_notified(ai, fake_nmcli):
+    seen = []
+    service = ai.NetworkStatusService(RecordingPool(), None, interval=5, nmcli_cmd=["nmcli"])
+    service.subscribe(lambda connected, level: seen.append(connected))
+    ai.Clock.tick()
+    assert seen == [True]
+
+
+def test_every_poll_refreshes(ai, fake_nmcli, monkeypatch):
+    pool = RecordingPool()
+    service = ai.NetworkStatusService(pool, None, interval=5, nmcli_cmd=["nmcli"])
+    service._subscribers.append(lambda connected, level: None)
+
+    clock = [1000.0]
+    monkeypatch.setattr(ai.time, "monotonic", lambda: clock[0])
+    for _ in range(4):
+        service._poll(5)
+        clock[0] += 5
+
+    assert len(pool.submitted) == 4
+    assert service.forks == 4
@@ -0,0 +1,75 @@
+import socket
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def silent_server():
+    # Accepts the request and then sends nothing, the way Ollama holds its
+    # headers back until the first token is ready.
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    release = threading.Event()
+    accepted = []
+
+    def serve():
+        while not release.is_set():
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            accepted.append(conn)
+            conn.recv(65536)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    try:
+        yield "http://127.0.0.1:%d" % listener.getsockname()[1], accepted
+    finally:
+        release.set()
+        listener.close()
+        for conn in accepted:
+            conn.close()
+
+
+def _stream_in_thread(client, cancel):
+    outcome = {}
+
+    def run():
+        try:
+            list(client.stream_chat([{"role": "user", "content": "hi"}], cancel=cancel))
+        except Exception as e:
+            outcome["error"] = e
+        outcome["finished"] = time.monotonic()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def test_cancel_aborts_a_query_still_waiting_for_headers(ai, silent_server):
+    host, accepted = silent_server
+    client = ai.OllamaClient(host, read_timeout=30, retries=2, backoff=0.5)
+    cancel = ai.CancelToken()
+    thread, outcome = _stream_in_thread(client, cancel)
+    try:
+        deadline = time.monotonic() + 5
+        while not accepted and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert accepted
+        time.sleep(0.2)
+        cancelled_at = time.monotonic()
+        cancel.cancel()
+        thread.join(5)
+
+        assert not thread.is_alive()
+        assert outcome["finished"] - cancelled_at < 1.0
+        assert isinstance(outcome["error"], ai.QueryCancelled)
+        # Cancelling does not retry against the same silent server.
+        assert len(accepted) == 1
+    finally:
+        client.close()
+
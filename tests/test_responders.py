@@ -0,0 +1,42 @@
+READINGS = [{"systolic": 150, "diastolic": 95, "bpm": 80, "timestamp": 0}]
+
+
+def test_rules_explain_a_reading_in_the_question(ai):
+    history = [{"role": "user", "text": "My BP is 118/76 and pulse 64 bpm"}]
+    text = ai.RuleBasedResponder().explain(history, READINGS)
+    assert "118/76" in text and "64 bpm" in text
+
+
+def test_rules_ignore_stored_readings_for_other_questions(ai):
+    history = [
+        {"role": "user", "text": "I measured 150/95 earlier"},
+        {"role": "assistant", "text": "..."},
+        {"role": "user", "text": "What should I eat for dinner?"},
+    ]
+    text = ai.RuleBasedResponder().explain(history, READINGS)
+    assert "150/95" not in text
+    assert "can't reach the AI service" in text
+
+
+class StalledResponder:
+    name = "stalled"
+    deadline = 0.2
+
+    def respond(self, history, readings, cancel=None):
+        cancel.wait(5)
+        return
+        yield
+
+
+def test_chain_falls_back_when_first_token_misses_deadline(ai):
+    pool = ai.JobPool({"stream": 2})
+    try:
+        chain = ai.ResponderChain([StalledResponder(), ai.RuleBasedResponder()], pool)
+        info = {}
+        history = [{"role": "user", "text": "BP 118/76"}]
+        text = "".join(chain.stream(history, [], info))
+        assert info["responder"] == "rules"
+        assert "118/76" in text
+        assert pool.stats()["stream"]["completed"] >= 1
+    finally:
+        pool.shutdown()
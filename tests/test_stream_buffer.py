@@ -0,0 +1,44 @@
+import gc
+import threading
+
+
+def _drain(ai, done, ticks=50):
+    for _ in range(ticks):
+        if done.is_set():
+            return
+        ai.Clock.tick()
+
+
+def test_flushes_after_the_producer_drops_the_buffer(ai):
+    chunks = []
+    done = threading.Event()
+
+    def on_flush(text, is_done):
+        chunks.append(text)
+        if is_done:
+            done.set()
+
+    def produce():
+        stream = ai.StreamBuffer(on_flush, 0)
+        for token in ("Hel", "lo", " there"):
+            stream.push(token)
+        stream.finish()
+
+    worker = threading.Thread(target=produce)
+    worker.start()
+    worker.join()
+    gc.collect()
+
+    _drain(ai, done)
+    assert done.is_set()
+    assert "".join(chunks) == "Hello there"
+
+
+def test_tokens_are_coalesced_into_one_flush(ai):
+    flushes = []
+    stream = ai.StreamBuffer(lambda text, is_done: flushes.append((text, is_done)), 0)
+    for token in ("a", "b", "c"):
+        stream.push(token)
+    stream.finish()
+    ai.Clock.tick()
+    assert flushes == [("abc", True)]
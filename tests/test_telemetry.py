@@ -0,0 +1,47 @@
+import gzip
+import json
+
+import pytest
+
+
+ENVELOPE = {
+    "schema": 1,
+    "device": "pi-test",
+    "seq": 7,
+    "sent": 1700000000.5,
+    "samples": [{"type": "vitals", "ts": 1700000000.25, "data": {"systolic": 120, "diastolic": 80}}],
+}
+
+
+def test_module_imports(ai):
+    assert ai.TELEMETRY_ENCODING in ("json", "gzip", "msgpack", "cbor")
+
+
+def test_json_round_trip(ai):
+    assert json.loads(ai.encode_telemetry(ENVELOPE, "json")) == ENVELOPE
+
+
+def test_gzip_round_trip(ai):
+    assert json.loads(gzip.decompress(ai.encode_telemetry(ENVELOPE, "gzip"))) == ENVELOPE
+
+
+def test_msgpack_round_trip(ai):
+    msgpack = pytest.importorskip("msgpack")
+    assert msgpack.unpackb(ai.encode_telemetry(ENVELOPE, "msgpack"), raw=False) == ENVELOPE
+
+
+def test_cbor_round_trip(ai):
+    cbor2 = pytest.importorskip("cbor2")
+    assert cbor2.loads(ai.encode_telemetry(ENVELOPE, "cbor")) == ENVELOPE
+
+
+def test_missing_encoder_falls_back_to_gzip(ai, monkeypatch):
+    real_import = ai.importlib.import_module
+
+    def fake_import(name):
+        if name == "cbor2":
+            raise ImportError(name)
+        return real_import(name)
+
+    monkeypatch.setattr(ai.importlib, "import_module", fake_import)
+    assert ai.resolve_telemetry_encoding("cbor") == "gzip"
@@ -0,0 +1,42 @@
+import pytest
+
+
+@pytest.fixture(params=["jsonl", "sqlite"])
+def store(ai, request, tmp_path):
+    if request.param == "sqlite":
+        store = ai.SqliteVitalsStore(str(tmp_path / "history.db"), legacy_path=None, jsonl_path=None)
+    else:
+        store = ai.VitalsStore(str(tmp_path / "vitals.jsonl"), legacy_path=None)
+    store.load()
+    yield store
+    store.close()
+
+
+def _pages(store, size):
+    pages, cursor = [], None
+    while True:
+        page = store.latest(size, before=cursor)
+        if not page:
+            return pages
+        pages.append([r["id"] for r in page])
+        cursor = (page[-1]["timestamp"], page[-1]["id"])
+
+
+def test_paging_follows_timestamps_when_the_clock_went_back(store):
+    # Ids 1-5 were recorded before the clock was set back; ids 6-10 after.
+    for i in range(5):
+        store.append(120, 80, 70, timestamp=1000 + i)
+    for i in range(5):
+        store.append(120, 80, 70, timestamp=500 + i)
+
+    assert _pages(store, 4) == [[5, 4, 3, 2], [1, 10, 9, 8], [7, 6]]
+
+
+def test_paging_survives_reload_and_delete(store):
+    for ts in (300, 100, 200, 100):
+        store.append(120, 80, 70, timestamp=ts)
+    store.delete(3)
+    store.close()
+    store.load()
+
+    assert _pages(store, 2) == [[1, 4], [2]]